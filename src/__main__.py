@@ -13,17 +13,18 @@ Usage:
 
 import sys
 import time
-import subprocess
+import contextlib
 from pathlib import Path
+from typing import Callable
 
 
-def run_step(step_name: str, command: list, description: str):
+def run_step(step_name: str, step: Callable[[], bool], description: str):
     """
-    Run a single workflow step and measure time.
+    Run a single workflow step in-process and measure time.
 
     Args:
         step_name: Name of the step for logging
-        command: Command to execute
+        step: Entry point of the step module; returns True on success
         description: Description of what the step does
 
     Returns:
@@ -36,16 +37,21 @@ def run_step(step_name: str, command: list, description: str):
     step_start = time.time()
 
     try:
-        result = subprocess.run(command, check=True, capture_output=False, text=True)
-        step_time = time.time() - step_start
-        print(f"{step_name.split(':')[0]} completed successfully in {step_time:.1f}s")
-        return True
-    except subprocess.CalledProcessError as e:
+        success = step()
+    except Exception as e:
         step_time = time.time() - step_start
         print(f"{step_name.split(':')[0]} failed after {step_time:.1f}s")
         print(f"Error: {e}")
         return False
 
+    step_time = time.time() - step_start
+    if not success:
+        print(f"{step_name.split(':')[0]} failed after {step_time:.1f}s")
+        return False
+
+    print(f"{step_name.split(':')[0]} completed successfully in {step_time:.1f}s")
+    return True
+
 
 def run_complete_workflow():
     """Execute the complete Bitwarden bulk management workflow."""
@@ -58,34 +64,36 @@ def run_complete_workflow():
     workflow_start = time.time()
 
     try:
+        # Step modules use flat imports, so they are loaded once main() has put
+        # src/ on sys.path.
+        from execute_collection_creation import main as collections_main
+        from bitwarden_groups import main as groups_main
+        from bitwarden_permissions import main as permissions_main
+
         # Step 1: Create Collections
         success1 = run_step(
             "STEP 1: Creating Collections from CSV",
-            ["python", "execute_collection_creation.py"],
+            collections_main,
             "Creating nested collections from CSV input using Bitwarden CLI"
         )
 
         if not success1:
             return False
 
-        time.sleep(2)  # Brief pause between steps
-
         # Step 2: Create Groups
         success2 = run_step(
             "STEP 2: Creating Groups from CSV input",
-            ["python", "bitwarden_groups.py"],
+            groups_main,
             "Creating groups from CSV headers using Bitwarden Public API"
         )
 
         if not success2:
             return False
 
-        time.sleep(2)
-
         # Step 3: Assign Permissions
         success3 = run_step(
             "STEP 3: Assigning Group-Collection Permissions",
-            ["python", "bitwarden_permissions.py"],
+            permissions_main,
             "Assigning collection permissions to groups based on CSV matrix"
         )
 
@@ -123,31 +131,22 @@ def run_complete_workflow():
         return False
 
 
+def resolve_layout() -> tuple[Path, Path]:
+    """
+    Locate the src/ directory and the input CSV relative to this file.
+
+    Returns:
+        Tuple of (src_dir, csv_file); independent of the current working directory
+    """
+    src_dir = Path(__file__).resolve().parent
+    csv_file = src_dir.parent / "input" / "collections_permissions.csv"
+    return src_dir, csv_file
+
+
 def main():
     """Main entry point for the bulk management workflow."""
     try:
-        # Determine if we're running from project root or src/ directory
-        current_dir = Path.cwd()
-        src_dir = None
-        csv_file = None
-
-        if (current_dir / "src" / "execute_collection_creation.py").exists():
-            # Running from project root (python -m src)
-            src_dir = current_dir / "src"
-            csv_file = current_dir / "input" / "collections_permissions.csv"
-        elif (current_dir / "execute_collection_creation.py").exists():
-            # Running from src/ directory
-            src_dir = current_dir
-            csv_file = current_dir / ".." / "input" / "collections_permissions.csv"
-        else:
-            print("Error: Must be run from the src/ directory or use 'python -m src' from project root")
-            print("Current directory:", current_dir)
-            sys.exit(1)
-
-        # Change to src directory for script execution
-        original_dir = Path.cwd()
-        import os
-        os.chdir(src_dir)
+        src_dir, csv_file = resolve_layout()
 
         # Check if CSV file exists
         if not csv_file.exists():
@@ -155,8 +154,14 @@ def main():
             print("Please ensure the CSV file exists in the input/ directory.")
             sys.exit(1)
 
-        # Run the complete workflow
-        success = run_complete_workflow()
+        # Make the step modules' flat imports importable
+        if str(src_dir) not in sys.path:
+            sys.path.insert(0, str(src_dir))
+
+        # Run from src/ so the step modules' relative paths resolve; the original
+        # directory is restored however the workflow exits
+        with contextlib.chdir(src_dir):
+            success = run_complete_workflow()
 
         if success:
             print("\nAll operations completed successfully!")
@@ -171,14 +176,6 @@ def main():
     except Exception as e:
         print(f"\nUnexpected error: {e}")
         sys.exit(1)
-    finally:
-        # Restore original directory if it was changed
-        try:
-            if 'original_dir' in locals():
-                import os
-                os.chdir(original_dir)
-        except:
-            pass
 
 
 if __name__ == "__main__":
@@ -1,12 +1,13 @@
-import base64
-import json
-from typing import Dict, List, Optional
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from bw_auth import BitwardenAuth
 from bulk_logger import BulkLogger
 
 
-@dataclass
+@dataclass(slots=True)
 class CollectionInfo:
     """Information about a Bitwarden collection."""
     name: str
@@ -18,34 +19,28 @@ class CollectionInfo:
 class BitwardenCollectionManager:
     """Manage Bitwarden collections via CLI commands."""
 
+    # Siblings at the same depth are independent, so up to this many are created at once.
+    _MAX_CONCURRENT_CREATES = 8
+    # Progress lines are written in blocks of this many collections
+    _PRINT_BATCH_SIZE = 100
+
+    # Body for a new org collection, matching `bw get template org-collection` minus the
+    # placeholder group/user entries. Static, so there's no need to ask the CLI for it.
+    _ORG_COLLECTION_TEMPLATE: ClassVar[Dict] = {
+        "organizationId": "",
+        "name": "",
+        "externalId": None,
+        "groups": [],
+        "users": []
+    }
+
     def __init__(self, auth: BitwardenAuth | None = None, logger: BulkLogger | None = None):
         self.auth = auth if auth is not None else BitwardenAuth()
         self.organization_id = self.auth.organization_id
         self.created_collections: Dict[str, CollectionInfo] = {}
         self.logger = logger
-        self._template_cache: Optional[Dict] = None
-
-    def _get_template(self) -> Dict:
-        """Fetch the org-collection template once per manager instance and cache it.
-        The template is static for the run, so a single `bw get template` call is enough."""
-        if self._template_cache is None:
-            template_result = self.auth.run_command(["get", "template", "org-collection"])
-            self._template_cache = json.loads(template_result)
-        # Return a shallow copy so per-collection mutations don't pollute the cache.
-        return dict(self._template_cache)
-
-    def generate_create_command(self, collection_path: str) -> str:
-        """Generate the equivalent shell pipeline for creating a collection.
-
-        Mirrors `create_collection`: the live path caches `bw get template org-collection`
-        once per run and uses native base64 instead of `bw encode`. This helper is for
-        debug/display only — it shows the per-row equivalent without the caching."""
-        return (
-            f'bw get template org-collection | '
-            f'jq \'.organizationId="{self.organization_id}" | .name="{collection_path}"\' | '
-            f'base64 | '
-            f'bw create org-collection --organizationid {self.organization_id}'
-        )
+        # Guards created_collections and the bulk log when creating from worker threads
+        self._lock = threading.Lock()
 
     def generate_list_command(self) -> str:
         """Generate the CLI command to list all collections."""
@@ -57,11 +52,7 @@ class BitwardenCollectionManager:
         Used for de-duplication: paths in the CSV that match an existing collection name
         are skipped during creation. When the same name appears more than once in the org
         (Bitwarden permits this), the first ID encountered wins and a warning is logged."""
-        result = self.auth.run_command([
-            "list", "org-collections",
-            "--organizationid", self.organization_id
-        ])
-        collections = json.loads(result)
+        collections = self.auth.list_org_collections()
 
         name_to_id: Dict[str, str] = {}
         duplicate_counts: Dict[str, int] = {}
@@ -88,21 +79,19 @@ class BitwardenCollectionManager:
     def create_collection(self, collection_name: str, collection_path: str) -> CollectionInfo:
         """Create a collection and return its information."""
         try:
-            template_data = self._get_template()
+            # Fresh lists so the shared class-level template is never mutated
+            template_data = dict(self._ORG_COLLECTION_TEMPLATE, groups=[], users=[])
             template_data["organizationId"] = self.organization_id
             template_data["name"] = collection_path  # Full path drives nesting
 
-            # `bw encode` is just base64 of stdin; do it in-process to avoid a subprocess per row.
-            template_json = json.dumps(template_data)
-            encoded_result = base64.b64encode(template_json.encode("utf-8")).decode("ascii")
-
-            create_result = self.auth.run_command([
-                "create", "org-collection",
-                "--organizationid", self.organization_id
-            ], input_data=encoded_result)
+            # POST to the long-lived `bw serve` process rather than forking `bw create`
+            # per row; the REST API takes plain JSON, so no base64 encoding is needed.
+            collection_data = self.auth.serve_request(
+                "POST", "/object/org-collection",
+                params={"organizationId": self.organization_id},
+                json_body=template_data
+            )
 
-            # Parse the JSON response
-            collection_data = json.loads(create_result)
             collection_info = CollectionInfo(
                 name=collection_name,
                 path=collection_path,
@@ -110,43 +99,64 @@ class BitwardenCollectionManager:
                 organization_id=collection_data.get('organizationId')
             )
 
-            # Store the created collection
-            self.created_collections[collection_path] = collection_info
+            with self._lock:
+                # Store the created collection
+                self.created_collections[collection_path] = collection_info
 
-            # Log successful creation
-            if self.logger and collection_info.id:
-                self.logger.log_collection_created(
-                    collection_path=collection_path,
-                    collection_id=collection_info.id,
-                    organization_id=self.organization_id
-                )
+                # Log successful creation
+                if self.logger and collection_info.id:
+                    self.logger.log_collection_created(
+                        collection_path=collection_path,
+                        collection_id=collection_info.id,
+                        organization_id=self.organization_id
+                    )
 
             return collection_info
 
         except Exception as e:
             # Log failed creation
             if self.logger:
-                self.logger.log_collection_failed(
-                    collection_path=collection_path,
-                    organization_id=self.organization_id,
-                    error_message=str(e)
-                )
+                with self._lock:
+                    self.logger.log_collection_failed(
+                        collection_path=collection_path,
+                        organization_id=self.organization_id,
+                        error_message=str(e)
+                    )
             raise Exception(f"Failed to create collection '{collection_name}': {e}")
 
-    def create_collections_from_paths(self, collection_paths: List[str]) -> Dict[str, CollectionInfo]:
-        """Create collections for all given paths, handling hierarchy."""
-        # Sort paths to ensure parent collections are created first
-        sorted_paths = sorted(collection_paths, key=lambda x: (x.count('/'), x))
-
-        for path in sorted_paths:
-            collection_name = path.split('/')[-1]  # Get the last segment as the name
-            print(f"Creating collection: {collection_name} (path: {path})")
+    def _try_create(self, collection_name: str, path: str) -> Tuple[Optional[CollectionInfo], Optional[Exception]]:
+        """Create one collection, returning (info, error) instead of raising."""
+        try:
+            return self.create_collection(collection_name, path), None
+        except Exception as e:
+            return None, e
 
-            try:
-                collection_info = self.create_collection(collection_name, path)
-                print(f"✓ Created collection '{collection_name}' with ID: {collection_info.id}")
-            except Exception as e:
-                print(f"✗ Error creating collection '{collection_name}': {e}")
+    def create_collections_from_paths(self, collection_paths: List[str]) -> Dict[str, CollectionInfo]:
+        """Create collections for all given paths, handling hierarchy.
+
+        Paths are created one depth level at a time so parents always exist before
+        their children; siblings within a level are created concurrently."""
+        # Decorate once with (depth, path, leaf name) and sort, so parent collections come first
+        decorated = sorted((path.count('/'), path, path.rpartition('/')[2]) for path in collection_paths)
+
+        with ThreadPoolExecutor(max_workers=self._MAX_CONCURRENT_CREATES) as executor:
+            for _, level in itertools.groupby(decorated, key=lambda entry: entry[0]):
+                _, level_paths, level_names = zip(*level)
+                results = executor.map(self._try_create, level_names, level_paths)
+                # Buffer the per-collection lines and write them in blocks, flushing
+                # every _PRINT_BATCH_SIZE results so long levels still show progress
+                lines: List[str] = []
+                for count, (path, collection_name, (collection_info, error)) in enumerate(
+                        zip(level_paths, level_names, results), 1):
+                    lines.append(f"Creating collection: {collection_name} (path: {path})")
+                    if error is None:
+                        lines.append(f"✓ Created collection '{collection_name}' with ID: {collection_info.id}")
+                    else:
+                        lines.append(f"✗ Error creating collection '{collection_name}': {error}")
+                    if count % self._PRINT_BATCH_SIZE == 0:
+                        print("\n".join(lines), flush=True)
+                        lines.clear()
+                if lines:
+                    print("\n".join(lines), flush=True)
 
         return self.created_collections
-
@@ -5,18 +5,32 @@ Bitwarden Groups Management Module (INT-249)
 Creates groups using the Bitwarden Public API.
 """
 
+import re
 import json
-from typing import List, Dict, Set, Optional, Tuple
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Set, Optional, Tuple
 from pathlib import Path
 
 from csv_parser import CollectionPermissionParser
 from bw_api_auth import BitwardenAPIAuth
 from bulk_logger import BulkLogger
+from config import REPO_ROOT, ensure_dir
+
+# Bitwarden group names are required and capped at 100 characters server-side; control
+# characters are rejected here too. The lookahead rejects whitespace-only names.
+# Used with fullmatch: `$` would also accept a trailing newline.
+_GROUP_NAME_RE = re.compile(r"(?=.*\S)[^\x00-\x1f\x7f]{1,100}")
 
 
 class BitwardenGroupsManager:
     """Manage Bitwarden Groups via Public API based on CSV input."""
 
+    # Group creation is network-bound; overlap up to this many POSTs. Request starts are
+    # still paced by BitwardenAPIAuth's throttle, so this only hides round-trip latency.
+    _MAX_CONCURRENT_REQUESTS = 10
+
     def __init__(self, csv_path: str, log_dir: str = "../logs"):
         self.csv_path = Path(csv_path)
         self.parser = CollectionPermissionParser(csv_path)
@@ -25,6 +39,7 @@ class BitwardenGroupsManager:
 
         self.groups_data: List[str] = []
         self.created_groups: Dict[str, str] = {}  # group_name -> group_id
+        self._existing_groups_cache: Optional[Dict[str, str]] = None
 
     def extract_groups_from_csv(self) -> List[str]:
         """
@@ -36,12 +51,12 @@ class BitwardenGroupsManager:
         try:
             self.logger.logger.info(" Parsing CSV headers for group extraction...")
 
-            parsed_data = self.parser.parse()
-            self.groups_data = parsed_data['groups']
+            # Group names live in the header row alone; no need to parse the matrix body
+            self.groups_data = self.parser.read_groups()
 
             self.logger.logger.info(f" Found {len(self.groups_data)} groups in CSV:")
-            for group in self.groups_data:
-                self.logger.logger.info(f"    {group}")
+            if self.groups_data and self.logger.logger.isEnabledFor(logging.INFO):
+                self.logger.logger.info("    " + "\n    ".join(self.groups_data))
 
             return self.groups_data
 
@@ -59,8 +74,11 @@ class BitwardenGroupsManager:
         valid = True
 
         for group_name in self.groups_data:
-            if not group_name or len(group_name.strip()) == 0:
-                self.logger.logger.error(f" Empty group name found")
+            if not _GROUP_NAME_RE.fullmatch(group_name):
+                self.logger.logger.error(
+                    f" Invalid group name: '{group_name}' "
+                    f"(must be 1-100 characters, not blank, with no control characters)"
+                )
                 valid = False
             else:
                 self.logger.logger.debug(f" Valid group name: '{group_name}'")
@@ -71,9 +89,16 @@ class BitwardenGroupsManager:
         """
         Check for existing groups.  Groups with existing names will not be reacreated to avoid duplicates.
 
+        The org's group list is fetched once per manager and reused on later calls;
+        groups created by this manager are added to the cached list as they succeed.
+
         Returns:
             Dict mapping group_name -> group_id for existing groups
         """
+        if self._existing_groups_cache is not None:
+            self.logger.logger.debug(" Using cached existing groups")
+            return self._existing_groups_cache.copy()
+
         try:
             self.logger.logger.info(" Checking for existing groups...")
 
@@ -88,24 +113,35 @@ class BitwardenGroupsManager:
                     existing_groups[group_name] = group_id
 
             self.logger.logger.info(f" Found {len(existing_groups)} existing groups:")
-            for name, group_id in existing_groups.items():
-                self.logger.logger.info(f"    Group Name: '{name}' → objectID: {group_id}")
+            if existing_groups and self.logger.logger.isEnabledFor(logging.INFO):
+                self.logger.logger.info("\n".join(
+                    f"    Group Name: '{name}' → objectID: {group_id}"
+                    for name, group_id in existing_groups.items()
+                ))
 
-            return existing_groups
+            self._existing_groups_cache = existing_groups
+            return existing_groups.copy()
 
         except Exception as e:
             self.logger.logger.error(f" Failed to check existing groups: {e}")
             raise
 
-    def create_group(self, group_name: str) -> Optional[str]:
+    def invalidate_existing_groups_cache(self) -> None:
+        """Forget the cached group list so the next check re-fetches it from the API."""
+        self._existing_groups_cache = None
+
+    def _request_group_creation(self, group_name: str) -> Tuple[Optional[str], Optional[str]]:
         """
-        Create a single group via Bitwarden Public API.
+        POST a single group to the Bitwarden Public API without touching the bulk log.
+
+        Safe to call from worker threads; the caller is responsible for logging the
+        outcome so that log entries keep CSV order.
 
         Args:
             group_name: Name of the group to create
 
         Returns:
-            Group ID if successful, None if failed
+            Tuple of (group_id, error_message); exactly one of them is None
         """
         try:
             self.logger.logger.info(f" Creating group: '{group_name}'")
@@ -122,17 +158,36 @@ class BitwardenGroupsManager:
 
             group_id = group_response.get('id')
             if group_id:
-                self.logger.log_group_created(group_name, group_id, self.api_auth.organization_id)
-                return group_id
-            else:
-                error_msg = f"No group ID returned in response: {group_response}"
-                self.logger.log_group_failed(group_name, self.api_auth.organization_id, error_msg)
-                return None
+                return group_id, None
+            return None, f"No group ID returned in response: {group_response}"
 
         except Exception as e:
-            error_msg = f"API request failed: {str(e)}"
-            self.logger.log_group_failed(group_name, self.api_auth.organization_id, error_msg)
-            return None
+            return None, f"API request failed: {str(e)}"
+
+    def _log_group_result(self, group_name: str, group_id: Optional[str],
+                          error_msg: Optional[str]) -> None:
+        """Record the outcome of a group creation request in the bulk log."""
+        org_id = self.api_auth.organization_id
+        if group_id:
+            self.logger.log_group_created(group_name, group_id, org_id)
+            if self._existing_groups_cache is not None:
+                self._existing_groups_cache[group_name] = group_id
+        else:
+            self.logger.log_group_failed(group_name, org_id, error_msg)
+
+    def create_group(self, group_name: str) -> Optional[str]:
+        """
+        Create a single group via Bitwarden Public API.
+
+        Args:
+            group_name: Name of the group to create
+
+        Returns:
+            Group ID if successful, None if failed
+        """
+        group_id, error_msg = self._request_group_creation(group_name)
+        self._log_group_result(group_name, group_id, error_msg)
+        return group_id
 
     def create_all_groups(self, skip_existing: bool = True) -> Dict[str, str]:
         """
@@ -161,31 +216,37 @@ class BitwardenGroupsManager:
 
             # Step 4: Create new groups
             all_groups = existing_groups.copy()
-            groups_to_create = []
+            existing_names = set(existing_groups)
+            groups_to_create = [g for g in self.groups_data if g not in existing_names]
+            groups_to_skip = [g for g in self.groups_data if g in existing_names]
 
-            for group_name in self.groups_data:
-                if group_name in existing_groups:
-                    self.logger.logger.info(f"  Skipping existing group: '{group_name}'")
-                else:
-                    groups_to_create.append(group_name)
+            if groups_to_skip and self.logger.logger.isEnabledFor(logging.INFO):
+                self.logger.logger.info("\n".join(
+                    f"  Skipping existing group: '{group_name}'" for group_name in groups_to_skip
+                ))
 
             self.logger.logger.info(f" Groups to create: {len(groups_to_create)}")
-            self.logger.logger.info(f" Groups to skip: {len(existing_groups)}")
+            self.logger.logger.info(f" Groups to skip: {len(groups_to_skip)}")
 
-            # Create each new group
-            skipped_count = len(existing_groups)
+            # Create new groups concurrently, then log results in CSV order
+            skipped_count = len(groups_to_skip)
             created_count = 0
             failed_count = 0
 
-            for group_name in groups_to_create:
-                group_id = self.create_group(group_name)
+            with ThreadPoolExecutor(max_workers=self._MAX_CONCURRENT_REQUESTS) as executor:
+                results = list(executor.map(self._request_group_creation, groups_to_create))
+
+            for group_name, (group_id, error_msg) in zip(groups_to_create, results):
+                self._log_group_result(group_name, group_id, error_msg)
                 if group_id:
                     all_groups[group_name] = group_id
                     created_count += 1
                 else:
                     failed_count += 1
 
-            self.created_groups = all_groups
+            # Update in place so views handed out by get_created_groups() stay live
+            self.created_groups.clear()
+            self.created_groups.update(all_groups)
 
             # Final summary
             total_attempted = len(groups_to_create)
@@ -207,16 +268,26 @@ class BitwardenGroupsManager:
             self.logger.logger.error(f" Group creation process failed: {e}")
             raise
 
-    def get_created_groups(self) -> Dict[str, str]:
-        """Get mapping of created group names to IDs."""
+    def get_created_groups(self) -> Mapping[str, str]:
+        """Get a read-only, live view of the group name -> ID mapping (no copy made)."""
+        return MappingProxyType(self.created_groups)
+
+    def get_created_groups_snapshot(self) -> Dict[str, str]:
+        """Get an independent copy of the group name -> ID mapping."""
         return self.created_groups.copy()
 
-    def export_groups_mapping(self, output_file: str = None) -> str:
+    def close(self) -> None:
+        """Close the bulk log files and API connections held by this manager."""
+        self.logger.close()
+        self.api_auth.close()
+
+    def export_groups_mapping(self, output_file: str = None, pretty: bool = False) -> str:
         """
         Export group name -> ID mapping to JSON file.
 
         Args:
             output_file: Optional custom output file path
+            pretty: Indent the JSON for human reading; compact by default
 
         Returns:
             Path to exported file
@@ -227,20 +298,24 @@ class BitwardenGroupsManager:
 
         # Convert relative path to absolute from script location
         if not Path(output_file).is_absolute():
-            output_path = Path(__file__).parent.parent / output_file.lstrip("../")
+            output_path = REPO_ROOT / output_file.lstrip("../")
         else:
             output_path = Path(output_file)
-        output_path.parent.mkdir(exist_ok=True)
+        ensure_dir(output_path.parent)
 
-        with open(output_path, 'w') as f:
-            json.dump(self.created_groups, f, indent=2)
+        if pretty:
+            mapping_json = json.dumps(self.created_groups, indent=2)
+        else:
+            mapping_json = json.dumps(self.created_groups, separators=(',', ':'))
+        output_path.write_text(mapping_json)
 
         self.logger.logger.info(f" Groups mapping exported to: {output_path}")
         return str(output_path)
 
 
-def main():
-    """Main entry point for group creation from CSV."""
+def main() -> bool:
+    """Main entry point for group creation from CSV. Returns True on success."""
+    groups_manager = None
     try:
         # Initialise groups manager
         csv_path = "../input/collections_permissions.csv"
@@ -261,6 +336,13 @@ def main():
 
     except Exception as e:
         print(f" Group creation failed: {e}")
+        return False
+
+    finally:
+        if groups_manager is not None:
+            groups_manager.close()
+
+    return True
 
 
 if __name__ == "__main__":
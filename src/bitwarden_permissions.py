@@ -5,18 +5,41 @@ Bitwarden Permissions Management Module (INT-250)
 Handles group-collection permission assignments from CSV input using the Bitwarden Public API.
 """
 
+import re
 import json
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Any, Tuple
 from pathlib import Path
 
 from csv_parser import CollectionPermissionParser
 from bw_api_auth import BitwardenAPIAuth
 from bulk_logger import BulkLogger
+from config import REPO_ROOT, ensure_dir
+
+# Timestamp suffixes written by this tool: BulkLogger's YYYYMMDD_HHMMSS and the
+# groups mapping's YYYY-MM-DDTHHMMSS. Both sort chronologically as plain strings.
+_TIMESTAMP_SUFFIX_RE = re.compile(r"(\d{8}_\d{6}|\d{4}-\d{2}-\d{2}T\d{6})$")
+
+
+def _latest_file(files: List[Path]) -> Path:
+    """
+    Pick the newest file from the tool's timestamped outputs.
+
+    Files carrying the tool's timestamp suffix are compared by name, with no stat()
+    calls; only if none do (e.g. hand-named files) is modification time used.
+    """
+    timestamped = [f for f in files if _TIMESTAMP_SUFFIX_RE.search(f.stem)]
+    if timestamped:
+        return max(timestamped, key=lambda f: f.name)
+    return max(files, key=lambda f: f.stat().st_mtime)
 
 
 class BitwardenPermissionsManager:
     """Manage Bitwarden Group-Collection permissions via Public API based on CSV input."""
 
+    # Permission assignment is one network-bound PUT per group; overlap up to this many.
+    _MAX_CONCURRENT_REQUESTS = 8
+
     def __init__(self, csv_path: str, log_dir: str = "../logs"):
         self.csv_path = Path(csv_path)
         self.parser = CollectionPermissionParser(csv_path)
@@ -26,10 +49,17 @@ class BitwardenPermissionsManager:
         # CSV data
         self.csv_data: Dict = {}
         self.permission_matrix: Dict[str, Dict[str, str]] = {}
+        # group_name -> [(collection_path, permission_level)] for non-"None" cells only
+        self._by_group: Dict[str, List[Tuple[str, str]]] = {}
+        self._assigned_groups: set[str] = set()  # groups with at least one non-"None" cell
 
         # ID mappings
         self.collection_ids: Dict[str, str] = {}  # collection_path -> collection_id
         self.group_ids: Dict[str, str] = {}      # group_name -> group_id
+        # Per-group API payloads and their (collection_path, collection_id, level) details,
+        # resolved once by _precompute_associations
+        self._api_assoc_by_group: Dict[str, List[Dict[str, Any]]] = {}
+        self._assoc_details_by_group: Dict[str, List[Tuple[str, str, str]]] = {}
 
         # Permission mapping from CSV values to API format
         self.permission_mapping = {
@@ -40,6 +70,14 @@ class BitwardenPermissionsManager:
             "Manage": {"readOnly": False, "hidePasswords": False, "manage": True},
             "None": None  # Skip - don't include in collections array
         }
+        # Per-level association builders: each returns a complete association in one
+        # dict literal instead of splatting the level's permission dict per cell
+        self._assoc_factory: Dict[str, Callable[[str], Dict[str, Any]]] = {
+            level: (lambda cid, r=perms["readOnly"], h=perms["hidePasswords"], m=perms["manage"]:
+                    {"id": cid, "readOnly": r, "hidePasswords": h, "manage": m})
+            for level, perms in self.permission_mapping.items()
+            if perms
+        }
 
     def parse_csv_permissions(self) -> Dict[str, Dict[str, str]]:
         """
@@ -53,6 +91,8 @@ class BitwardenPermissionsManager:
 
             self.csv_data = self.parser.parse()
             self.permission_matrix = self.csv_data['permissions']
+            self._by_group = self._index_permissions_by_group()
+            self._assigned_groups = set(self._by_group)
 
             self.logger.logger.info(f" Found permissions for {len(self.permission_matrix)} collections:")
             for collection_path, group_perms in self.permission_matrix.items():
@@ -64,6 +104,21 @@ class BitwardenPermissionsManager:
             self.logger.logger.error(f" Failed to parse CSV permissions: {e}")
             raise
 
+    def _index_permissions_by_group(self) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Invert the matrix into per-group lists of real assignments in one pass.
+
+        Returns:
+            Dict mapping group_name -> [(collection_path, permission_level)], skipping
+            "None" cells; groups with no assignments are absent
+        """
+        by_group: Dict[str, List[Tuple[str, str]]] = {}
+        for collection_path, group_perms in self.permission_matrix.items():
+            for group_name, permission in group_perms.items():
+                if permission and permission != "None":
+                    by_group.setdefault(group_name, []).append((collection_path, permission))
+        return by_group
+
     def load_collection_ids(self) -> Dict[str, str]:
         """
         Load collection IDs from the most recent collection creation log.
@@ -79,16 +134,12 @@ class BitwardenPermissionsManager:
             if not log_files:
                 raise FileNotFoundError("No collection creation log files found")
 
-            latest_log = max(log_files, key=lambda x: x.stat().st_mtime)
-            self.logger.logger.info(f" Reading from: {latest_log}")
-
-            with open(latest_log, 'r') as f:
-                log_data = json.load(f)
+            latest_log = _latest_file(log_files)
 
             # Extract collection mappings. "existing" entries are logged to avoid duplication:
             # collections may be already in the org and can be reused.
             # These still get permissions assigned.
-            for entry in log_data.get("collections", []):
+            for entry in self._iter_collection_log_entries(latest_log):
                 if entry.get("status") in ("created", "existing"):
                     collection_path = entry["collection_path"]
                     collection_id = entry["collection_id"]
@@ -104,6 +155,36 @@ class BitwardenPermissionsManager:
             self.logger.logger.error(f" Failed to load collection IDs: {e}")
             raise
 
+    def _iter_collection_log_entries(self, log_file: Path):
+        """
+        Yield the collection entries of a collection creation run.
+
+        Prefers the run's JSON Lines event file, streamed one entry at a time so memory
+        stays flat however large the run was; falls back to the aggregated JSON for
+        logs written before event files existed.
+        """
+        events_file = log_file.with_suffix(".jsonl")
+        if events_file.exists():
+            self.logger.logger.info(f" Reading from: {events_file}")
+            with open(events_file, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError as e:
+                        # e.g. a run killed mid-write leaves a truncated last line
+                        self.logger.logger.warning(f"  Skipping unreadable line {line_no} of {events_file}: {e}")
+                        continue
+                    if entry.get("section") == "collections":
+                        yield entry
+            return
+
+        self.logger.logger.info(f" Reading from: {log_file}")
+        with open(log_file, 'r') as f:
+            log_data = json.load(f)
+        yield from log_data.get("collections", [])
+
     def load_group_ids(self) -> Dict[str, str]:
         """
         Load group IDs from the most recent group creation output.
@@ -119,7 +200,7 @@ class BitwardenPermissionsManager:
             if not output_files:
                 raise FileNotFoundError("No group mapping files found")
 
-            latest_mapping = max(output_files, key=lambda x: x.stat().st_mtime)
+            latest_mapping = _latest_file(output_files)
             self.logger.logger.info(f" Reading from: {latest_mapping}")
 
             with open(latest_mapping, 'r') as f:
@@ -135,25 +216,20 @@ class BitwardenPermissionsManager:
             self.logger.logger.error(f" Failed to load group IDs: {e}")
             raise
 
-    def convert_csv_to_api_permissions(self, group_name: str) -> List[Dict[str, Any]]:
+    def _build_associations(self, group_name: str) -> List[Tuple[Dict[str, Any], str, str]]:
         """
-        Convert CSV permissions for a group to API format.
+        Resolve a group's CSV permissions into API associations.
 
         Args:
             group_name: Name of the group to process
 
         Returns:
-            List of AssociationWithPermissionsRequestModel objects
+            List of (association, collection_path, permission_level) tuples
         """
-        collections_list = []
-
-        for collection_path, group_perms in self.permission_matrix.items():
-            permission_level = group_perms.get(group_name, "None")
-
-            # Skip if no permission or permission is "None"
-            if permission_level == "None" or permission_level is None:
-                continue
+        entries = []
 
+        # Only this group's non-"None" cells, not the whole matrix
+        for collection_path, permission_level in self._by_group.get(group_name, ()):
             # Get collection ID
             collection_id = self.collection_ids.get(collection_path)
             if not collection_id:
@@ -161,20 +237,51 @@ class BitwardenPermissionsManager:
                 continue
 
             # Convert permission to API format
-            api_permissions = self.permission_mapping.get(permission_level)
-            if not api_permissions:
+            build_association = self._assoc_factory.get(permission_level)
+            if not build_association:
                 self.logger.logger.warning(f"  Unknown permission level: '{permission_level}' for {collection_path}")
                 continue
 
-            # Create association object
-            association = {
-                "id": collection_id,
-                **api_permissions
-            }
-            collections_list.append(association)
+            entries.append((build_association(collection_id), collection_path, permission_level))
+
+        self.logger.logger.debug(f" Group '{group_name}' has {len(entries)} collection associations")
+        return entries
+
+    def convert_csv_to_api_permissions(self, group_name: str) -> List[Dict[str, Any]]:
+        """
+        Convert CSV permissions for a group to API format.
+
+        Args:
+            group_name: Name of the group to process
 
-        self.logger.logger.debug(f" Group '{group_name}' has {len(collections_list)} collection associations")
-        return collections_list
+        Returns:
+            List of AssociationWithPermissionsRequestModel objects
+        """
+        return [association for association, _, _ in self._build_associations(group_name)]
+
+    def _precompute_associations(self) -> None:
+        """
+        Resolve the associations of every group that will be assigned, once.
+
+        Runs after validation, so only groups with CSV assignments that exist
+        in the organisation are built. The matrix, collection IDs and permission
+        mapping don't change during assignment, so each payload and its log
+        details are built up front.
+        """
+        self._api_assoc_by_group = {}
+        self._assoc_details_by_group = {}
+        for group_name in self._assigned_groups:
+            if group_name in self.group_ids:
+                self._store_associations(group_name)
+
+    def _store_associations(self, group_name: str) -> None:
+        """Resolve one group's associations and cache its payload and log details."""
+        entries = self._build_associations(group_name)
+        self._api_assoc_by_group[group_name] = [association for association, _, _ in entries]
+        self._assoc_details_by_group[group_name] = [
+            (collection_path, association["id"], permission_level)
+            for association, collection_path, permission_level in entries
+        ]
 
     def assign_permissions_to_group(self, group_name: str, group_id: str) -> bool:
         """
@@ -190,8 +297,10 @@ class BitwardenPermissionsManager:
         try:
             self.logger.logger.info(f" Assigning permissions to group: '{group_name}'")
 
-            # Convert CSV permissions to API format
-            collections_list = self.convert_csv_to_api_permissions(group_name)
+            # Use the precomputed associations; resolve on the fly if called standalone
+            if group_name not in self._api_assoc_by_group:
+                self._store_associations(group_name)
+            collections_list = self._api_assoc_by_group[group_name]
 
             # Prepare group update data
             group_data = {
@@ -203,33 +312,13 @@ class BitwardenPermissionsManager:
             # Make API request
             response = self.api_auth.make_api_request('PUT', f'/public/groups/{group_id}', group_data)
 
-            # Log each permission assignment
-            for association in collections_list:
-                collection_id = association["id"]
-                # Find collection path from ID
-                collection_path = None
-                for path, coll_id in self.collection_ids.items():
-                    if coll_id == collection_id:
-                        collection_path = path
-                        break
-
-                # Determine permission level
-                permission_level = "Unknown"
-                if association.get("manage"):
-                    permission_level = "Manage"
-                elif association.get("readOnly"):
-                    permission_level = "ReadPWsHidden" if association.get("hidePasswords") else "Read"
-                else:
-                    permission_level = "EditPWsHidden" if association.get("hidePasswords") else "Edit"
-
-                self.logger.log_permission_mapped(
-                    collection_path or collection_id,
-                    collection_id,
-                    group_name,
-                    group_id,
-                    permission_level,
-                    self.api_auth.organization_id or ""
-                )
+            # Log every permission assignment of this group in one batch
+            self.logger.log_permissions_batch(
+                group_name,
+                group_id,
+                self.api_auth.organization_id or "",
+                self._assoc_details_by_group[group_name]
+            )
 
             return True
 
@@ -237,17 +326,13 @@ class BitwardenPermissionsManager:
             error_msg = f"API request failed: {str(e)}"
             self.logger.logger.error(f" Failed to assign permissions to '{group_name}': {error_msg}")
 
-            # Log failure for each attempted permission
-            for collection_path, group_perms in self.permission_matrix.items():
-                permission_level = group_perms.get(group_name, "None")
-                if permission_level != "None":
-                    self.logger.log_permission_failed(
-                        collection_path,
-                        group_name,
-                        permission_level,
-                        self.api_auth.organization_id or "",
-                        error_msg
-                    )
+            # Log failure for each attempted permission ("None" cells are already excluded)
+            self.logger.log_permissions_failed_batch(
+                group_name,
+                self.api_auth.organization_id or "",
+                self._by_group.get(group_name, []),
+                error_msg
+            )
             return False
 
     def validate_permissions(self) -> bool:
@@ -272,30 +357,21 @@ class BitwardenPermissionsManager:
             self.logger.logger.error(" No permission matrix parsed")
             valid = False
 
-        # Check for missing collection IDs
-        missing_collections = []
-        for collection_path in self.permission_matrix.keys():
-            if collection_path not in self.collection_ids:
-                missing_collections.append(collection_path)
+        # Nothing to cross-check against if any input is empty
+        if not valid:
+            return False
 
+        # Check for missing collection IDs (set difference; listed in CSV order for the message)
+        missing_collections = self.permission_matrix.keys() - self.collection_ids.keys()
         if missing_collections:
-            self.logger.logger.error(f" Missing collection IDs for: {missing_collections}")
+            missing_list = [p for p in self.permission_matrix if p in missing_collections]
+            self.logger.logger.error(f" Missing collection IDs for: {missing_list}")
             valid = False
 
         # Check for missing group IDs for groups that have at least one non-"None" permission assignment in the matrix.
-        assigned_groups = set()
-        for group_perms in self.permission_matrix.values():
-            for group_name, permission in group_perms.items():
-                if permission and permission != "None":
-                    assigned_groups.add(group_name)
-
-        missing_groups = []
-        for group_name in assigned_groups:
-            if group_name not in self.group_ids:
-                missing_groups.append(group_name)
-
+        missing_groups = self._assigned_groups - self.group_ids.keys()
         if missing_groups:
-            self.logger.logger.error(f" Missing group IDs for: {missing_groups}")
+            self.logger.logger.error(f" Missing group IDs for: {sorted(missing_groups)}")
             valid = False
 
         if valid:
@@ -326,31 +402,33 @@ class BitwardenPermissionsManager:
             if not self.validate_permissions():
                 raise ValueError("Permission validation failed")
 
+            self._precompute_associations()
+
             # Step 4: Assign permissions to each group
-            results = {}
-            succeeded = 0
-            failed = 0
+            groups_to_assign = []
 
             for group_name, group_id in self.group_ids.items():
                 # Skip groups with no real assignment in the CSV. A header-only group
                 # (all cells "None") would otherwise get a PUT with collections=[],
                 # wiping any existing collection access.
-                has_permissions = any(
-                    group_perms.get(group_name) and group_perms.get(group_name) != "None"
-                    for group_perms in self.permission_matrix.values()
-                )
-
-                if not has_permissions:
+                if group_name not in self._assigned_groups:
                     self.logger.logger.info(f"  Skipping group '{group_name}' (no assignments in CSV)")
                     continue
 
-                success = self.assign_permissions_to_group(group_name, group_id)
-                results[group_name] = success
+                groups_to_assign.append((group_name, group_id))
+
+            # One PUT per group; overlap them to hide round-trip latency. Request
+            # pacing stays with BitwardenAPIAuth's throttle.
+            with ThreadPoolExecutor(max_workers=self._MAX_CONCURRENT_REQUESTS) as executor:
+                group_names = [group_name for group_name, _ in groups_to_assign]
+                outcomes = executor.map(
+                    self.assign_permissions_to_group,
+                    group_names,
+                    [group_id for _, group_id in groups_to_assign]
+                )
+                results = dict(zip(group_names, outcomes))
 
-                if success:
-                    succeeded += 1
-                else:
-                    failed += 1
+            succeeded = sum(1 for success in results.values() if success)
 
             # Final summary
             total_attempted = len(results)
@@ -371,6 +449,11 @@ class BitwardenPermissionsManager:
             self.logger.logger.error(f" Permission assignment failed: {e}")
             raise
 
+    def close(self) -> None:
+        """Close the bulk log files and API connections held by this manager."""
+        self.logger.close()
+        self.api_auth.close()
+
     def export_permission_summary(self, output_file: str = None) -> str:
         """
         Export permission assignment summary to JSON file.
@@ -387,10 +470,10 @@ class BitwardenPermissionsManager:
 
         # Convert relative path to absolute from script location
         if not Path(output_file).is_absolute():
-            output_path = Path(__file__).parent.parent / output_file.lstrip("../")
+            output_path = REPO_ROOT / output_file.lstrip("../")
         else:
             output_path = Path(output_file)
-        output_path.parent.mkdir(exist_ok=True)
+        ensure_dir(output_path.parent)
 
         # Create summary
         summary = {
@@ -409,28 +492,27 @@ class BitwardenPermissionsManager:
                 "collections": []
             }
 
-            for collection_path, group_perms in self.permission_matrix.items():
-                permission_level = group_perms.get(group_name, "None")
-                if permission_level != "None":
-                    collection_mapping = {
-                        "collection_path": collection_path,
-                        "collection_id": self.collection_ids.get(collection_path),
-                        "permission_level": permission_level,
-                        "api_permissions": self.permission_mapping.get(permission_level)
-                    }
-                    group_mapping["collections"].append(collection_mapping)
+            for collection_path, permission_level in self._by_group.get(group_name, ()):
+                collection_mapping = {
+                    "collection_path": collection_path,
+                    "collection_id": self.collection_ids.get(collection_path),
+                    "permission_level": permission_level,
+                    "api_permissions": self.permission_mapping.get(permission_level)
+                }
+                group_mapping["collections"].append(collection_mapping)
 
             summary["permission_mappings"].append(group_mapping)
 
-        with open(output_path, 'w') as f:
-            json.dump(summary, f, indent=2)
+        # Serialise in one shot and write once rather than streaming many small chunks
+        output_path.write_text(json.dumps(summary, indent=2))
 
         self.logger.logger.info(f" Permission summary exported to: {output_path}")
         return str(output_path)
 
 
-def main():
-    """Main entry point for permission assignment from CSV."""
+def main() -> bool:
+    """Main entry point for permission assignment from CSV. Returns True on success."""
+    permissions_manager = None
     try:
         # Initialise permissions manager
         csv_path = "../input/collections_permissions.csv"
@@ -452,6 +534,13 @@ def main():
 
     except Exception as e:
         print(f" Permission assignment failed: {e}")
+        return False
+
+    finally:
+        if permissions_manager is not None:
+            permissions_manager.close()
+
+    return True
 
 
 if __name__ == "__main__":
@@ -11,13 +11,17 @@ Logging includes:
 
 import logging
 import json
-from datetime import datetime
+import time
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass
 
+from config import REPO_ROOT, ensure_dir
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class CollectionLog:
     """Log entry for collection creation."""
     timestamp: str
@@ -27,7 +31,18 @@ class CollectionLog:
     status: str = "created"
     error_message: Optional[str] = None
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat dict of the fields (cheaper than dataclasses.asdict's deep copy)."""
+        return {
+            "timestamp": self.timestamp,
+            "collection_path": self.collection_path,
+            "collection_id": self.collection_id,
+            "organization_id": self.organization_id,
+            "status": self.status,
+            "error_message": self.error_message
+        }
+
+@dataclass(slots=True, frozen=True)
 class GroupLog:
     """Log entry for group creation."""
     timestamp: str
@@ -37,7 +52,18 @@ class GroupLog:
     status: str = "created"
     error_message: Optional[str] = None
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat dict of the fields (cheaper than dataclasses.asdict's deep copy)."""
+        return {
+            "timestamp": self.timestamp,
+            "group_name": self.group_name,
+            "group_id": self.group_id,
+            "organization_id": self.organization_id,
+            "status": self.status,
+            "error_message": self.error_message
+        }
+
+@dataclass(slots=True, frozen=True)
 class PermissionLog:
     """Log entry for permission mapping."""
     timestamp: str
@@ -50,7 +76,21 @@ class PermissionLog:
     status: str = "mapped"
     error_message: Optional[str] = None
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat dict of the fields (cheaper than dataclasses.asdict's deep copy)."""
+        return {
+            "timestamp": self.timestamp,
+            "collection_path": self.collection_path,
+            "collection_id": self.collection_id,
+            "group_name": self.group_name,
+            "group_id": self.group_id,
+            "permission_level": self.permission_level,
+            "organization_id": self.organization_id,
+            "status": self.status,
+            "error_message": self.error_message
+        }
+
+@dataclass(slots=True, frozen=True)
 class OperationSummary:
     """Summary of bulk operation results."""
     operation_type: str
@@ -63,28 +103,57 @@ class OperationSummary:
     organization_id: str
     csv_source_file: str
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat dict of the fields (cheaper than dataclasses.asdict's deep copy)."""
+        return {
+            "operation_type": self.operation_type,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "total_attempted": self.total_attempted,
+            "total_succeeded": self.total_succeeded,
+            "total_failed": self.total_failed,
+            "total_skipped": self.total_skipped,
+            "organization_id": self.organization_id,
+            "csv_source_file": self.csv_source_file
+        }
+
 
 class BulkLogger:
     """Comprehensive logger for Bitwarden bulk management operations."""
 
-    def __init__(self, log_dir: str = "../logs", operation_name: str = "bulk_operation"):
+    def __init__(self, log_dir: str = "../logs", operation_name: str = "bulk_operation",
+                 console_level: int = logging.INFO):
         # Convert relative path to absolute from script location
         if not Path(log_dir).is_absolute():
-            self.log_dir = Path(__file__).parent.parent / log_dir.lstrip("../")
+            self.log_dir = REPO_ROOT / log_dir.lstrip("../")
         else:
             self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
+        ensure_dir(self.log_dir)
+
+        # Create timestamped log files: per-event JSON Lines appended as the run goes,
+        # plus the aggregated JSON document written when the operation is finalised
+        # Anchor wall-clock time once; event timestamps are derived from the monotonic clock
+        self._t0_wall = datetime.now()
+        self._t0_mono = time.monotonic_ns()
 
-        # Create timestamped log file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = self._t0_wall.strftime("%Y%m%d_%H%M%S")
         self.log_file = self.log_dir / f"{operation_name}_{timestamp}.json"
+        self.events_file = self.log_dir / f"{operation_name}_{timestamp}.jsonl"
+        # Opened on the first event, so a run that logs nothing leaves no files behind
+        # to be mistaken for the latest run
+        self._events_fp = None
+        # log_* methods may be called from worker threads
+        self._lock = threading.Lock()
+        # Captured from the first entry that carries one; constant for the run
+        self._org_id: str = ""
 
         # Initialise log data structure
         self.log_data = {
             "operation_metadata": {
                 "operation_name": operation_name,
-                "start_time": datetime.now().isoformat(),
-                "log_file": str(self.log_file)
+                "start_time": self._t0_wall.isoformat(),
+                "log_file": str(self.log_file),
+                "events_file": str(self.events_file)
             },
             "collections": [],
             "groups": [],
@@ -93,15 +162,20 @@ class BulkLogger:
         }
 
         # Set up Python logging
-        self._setup_python_logging(operation_name, timestamp)
+        self._setup_python_logging(operation_name, timestamp, console_level)
 
-    def _setup_python_logging(self, operation_name: str, timestamp: str):
-        """Set up Python logging to file and console."""
+    def _setup_python_logging(self, operation_name: str, timestamp: str,
+                              console_level: int = logging.INFO):
+        """Set up Python logging to file and console.
+
+        The file always receives DEBUG and above; pass a higher console_level (e.g.
+        logging.WARNING) to keep per-event INFO lines off the terminal on large runs."""
         log_filename = self.log_dir / f"{operation_name}_{timestamp}.log"
 
         # Create formatter
         formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt="%Y-%m-%d %H:%M:%S"
         )
 
         # File handler
@@ -111,7 +185,7 @@ class BulkLogger:
 
         # Console handler
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
+        console_handler.setLevel(console_level)
         console_handler.setFormatter(formatter)
 
         # Set up logger
@@ -120,48 +194,49 @@ class BulkLogger:
 
         # Clear existing handlers to avoid duplicates
         self.logger.handlers.clear()
+        # Don't also echo through the root logger (bw_auth configures it via basicConfig)
+        self.logger.propagate = False
 
         self.logger.addHandler(file_handler)
         self.logger.addHandler(console_handler)
 
-        self.logger.info(f"Bulk operation logging initialised: {operation_name}")
-        self.logger.info(f"JSON log file: {self.log_file}")
-        self.logger.info(f"Text log file: {log_filename}")
+        self.logger.info("Bulk operation logging initialised: %s", operation_name)
+        self.logger.info("JSON log file: %s", self.log_file)
+        self.logger.info("JSON Lines event file: %s", self.events_file)
+        self.logger.info("Text log file: %s", log_filename)
 
     def log_collection_created(self, collection_path: str, collection_id: str,
                              organization_id: str) -> None:
         """Log successful collection creation."""
         log_entry = CollectionLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             collection_path=collection_path,
             collection_id=collection_id,
             organization_id=organization_id
         )
 
-        self.log_data["collections"].append(asdict(log_entry))
-        self.logger.info(f" Collection created: '{collection_path}' → ID: {collection_id}")
-        self._save_log()
+        self._record_event("collections", log_entry.to_dict())
+        self.logger.info(" Collection created: '%s' → ID: %s", collection_path, collection_id)
 
     def log_collection_existing(self, collection_path: str, collection_id: str,
                                 organization_id: str) -> None:
         """Log a pre-existing collection that was reused (skipped during creation)."""
         log_entry = CollectionLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             collection_path=collection_path,
             collection_id=collection_id,
             organization_id=organization_id,
             status="existing"
         )
 
-        self.log_data["collections"].append(asdict(log_entry))
-        self.logger.info(f" Collection existing (skipped): '{collection_path}' → ID: {collection_id}")
-        self._save_log()
+        self._record_event("collections", log_entry.to_dict())
+        self.logger.info(" Collection existing (skipped): '%s' → ID: %s", collection_path, collection_id)
 
     def log_collection_failed(self, collection_path: str, organization_id: str,
                             error_message: str) -> None:
         """Log failed collection creation."""
         log_entry = CollectionLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             collection_path=collection_path,
             collection_id="",
             organization_id=organization_id,
@@ -169,29 +244,27 @@ class BulkLogger:
             error_message=error_message
         )
 
-        self.log_data["collections"].append(asdict(log_entry))
-        self.logger.error(f" Collection failed: '{collection_path}' - {error_message}")
-        self._save_log()
+        self._record_event("collections", log_entry.to_dict())
+        self.logger.error(" Collection failed: '%s' - %s", collection_path, error_message)
 
     def log_group_created(self, group_name: str, group_id: str,
                          organization_id: str) -> None:
         """Log successful group creation."""
         log_entry = GroupLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             group_name=group_name,
             group_id=group_id,
             organization_id=organization_id
         )
 
-        self.log_data["groups"].append(asdict(log_entry))
-        self.logger.info(f" Group created: '{group_name}' → ID: {group_id}")
-        self._save_log()
+        self._record_event("groups", log_entry.to_dict())
+        self.logger.info(" Group created: '%s' → ID: %s", group_name, group_id)
 
     def log_group_failed(self, group_name: str, organization_id: str,
                         error_message: str) -> None:
         """Log failed group creation."""
         log_entry = GroupLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             group_name=group_name,
             group_id="",
             organization_id=organization_id,
@@ -199,16 +272,15 @@ class BulkLogger:
             error_message=error_message
         )
 
-        self.log_data["groups"].append(asdict(log_entry))
-        self.logger.error(f" Group failed: '{group_name}' - {error_message}")
-        self._save_log()
+        self._record_event("groups", log_entry.to_dict())
+        self.logger.error(" Group failed: '%s' - %s", group_name, error_message)
 
     def log_permission_mapped(self, collection_path: str, collection_id: str,
                              group_name: str, group_id: str, permission_level: str,
                              organization_id: str) -> None:
         """Log successful permission mapping."""
         log_entry = PermissionLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             collection_path=collection_path,
             collection_id=collection_id,
             group_name=group_name,
@@ -217,16 +289,15 @@ class BulkLogger:
             organization_id=organization_id
         )
 
-        self.log_data["permissions"].append(asdict(log_entry))
-        self.logger.info(f" Permission mapped: '{group_name}' → '{collection_path}' ({permission_level})")
-        self._save_log()
+        self._record_event("permissions", log_entry.to_dict())
+        self.logger.info(" Permission mapped: '%s' → '%s' (%s)", group_name, collection_path, permission_level)
 
     def log_permission_failed(self, collection_path: str, group_name: str,
                              permission_level: str, organization_id: str,
                              error_message: str) -> None:
         """Log failed permission mapping."""
         log_entry = PermissionLog(
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._now_iso(),
             collection_path=collection_path,
             collection_id="",
             group_name=group_name,
@@ -237,9 +308,54 @@ class BulkLogger:
             error_message=error_message
         )
 
-        self.log_data["permissions"].append(asdict(log_entry))
-        self.logger.error(f" Permission failed: '{group_name}' → '{collection_path}' ({permission_level}) - {error_message}")
-        self._save_log()
+        self._record_event("permissions", log_entry.to_dict())
+        self.logger.error(" Permission failed: '%s' → '%s' (%s) - %s", group_name, collection_path, permission_level, error_message)
+
+    def log_permissions_batch(self, group_name: str, group_id: str, organization_id: str,
+                              entries: List[Tuple[str, str, str]]) -> None:
+        """Log all successful permission mappings of one group in a single write.
+
+        Args:
+            entries: (collection_path, collection_id, permission_level) tuples
+        """
+        timestamp = self._now_iso()
+        self._record_events("permissions", [
+            PermissionLog(
+                timestamp=timestamp,
+                collection_path=collection_path,
+                collection_id=collection_id,
+                group_name=group_name,
+                group_id=group_id,
+                permission_level=permission_level,
+                organization_id=organization_id
+            ).to_dict()
+            for collection_path, collection_id, permission_level in entries
+        ])
+        self.logger.info(" Permissions mapped: '%s' → %d collections", group_name, len(entries))
+
+    def log_permissions_failed_batch(self, group_name: str, organization_id: str,
+                                     entries: List[Tuple[str, str]], error_message: str) -> None:
+        """Log all failed permission mappings of one group in a single write.
+
+        Args:
+            entries: (collection_path, permission_level) tuples
+        """
+        timestamp = self._now_iso()
+        self._record_events("permissions", [
+            PermissionLog(
+                timestamp=timestamp,
+                collection_path=collection_path,
+                collection_id="",
+                group_name=group_name,
+                group_id="",
+                permission_level=permission_level,
+                organization_id=organization_id,
+                status="failed",
+                error_message=error_message
+            ).to_dict()
+            for collection_path, permission_level in entries
+        ])
+        self.logger.error(" Permissions failed: '%s' → %d collections - %s", group_name, len(entries), error_message)
 
     def finalise_operation(self, operation_type: str, total_attempted: int,
                           total_succeeded: int, csv_source_file: str,
@@ -248,7 +364,7 @@ class BulkLogger:
         summary = OperationSummary(
             operation_type=operation_type,
             start_time=self.log_data["operation_metadata"]["start_time"],
-            end_time=datetime.now().isoformat(),
+            end_time=self._now_iso(),
             total_attempted=total_attempted,
             total_succeeded=total_succeeded,
             total_failed=total_attempted - total_succeeded,
@@ -257,19 +373,29 @@ class BulkLogger:
             csv_source_file=csv_source_file
         )
 
-        self.log_data["summary"] = asdict(summary)
+        self.log_data["summary"] = summary.to_dict()
         self._save_log()
 
         # Log summary
         self.logger.info("=" * 50)
-        self.logger.info(f" OPERATION SUMMARY: {operation_type}")
+        self.logger.info(" OPERATION SUMMARY: %s", operation_type)
         self.logger.info("=" * 50)
-        self.logger.info(f" Succeeded: {total_succeeded}")
-        self.logger.info(f" Failed: {total_attempted - total_succeeded}")
-        self.logger.info(f" Skipped: {total_skipped}")
-        self.logger.info(f" Total: {total_attempted}")
-        self.logger.info(f" Source: {csv_source_file}")
-        self.logger.info(f"️  Log file: {self.log_file}")
+        self.logger.info(" Succeeded: %s", total_succeeded)
+        self.logger.info(" Failed: %s", total_attempted - total_succeeded)
+        self.logger.info(" Skipped: %s", total_skipped)
+        self.logger.info(" Total: %s", total_attempted)
+        self.logger.info(" Source: %s", csv_source_file)
+        self.logger.info("️  Log file: %s", self.log_file)
+
+    def close(self) -> None:
+        """Close the event file and this logger's handlers. Safe to call more than once."""
+        with self._lock:
+            if self._events_fp is not None:
+                self._events_fp.close()
+                self._events_fp = None
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
 
     def get_created_collections(self) -> Dict[str, str]:
         """Get mapping of collection paths to IDs for successful creations."""
@@ -288,22 +414,58 @@ class BulkLogger:
         return groups
 
     def _get_org_id_from_logs(self) -> str:
-        """Extract organization ID from log entries."""
-        for entry in self.log_data["collections"]:
-            if entry["organization_id"]:
-                return entry["organization_id"]
-        for entry in self.log_data["groups"]:
-            if entry["organization_id"]:
-                return entry["organization_id"]
-        return ""
+        """Organization ID seen in the first log entry that carried one."""
+        return self._org_id
+
+    def _now_iso(self) -> str:
+        """Current time as ISO 8601, offset from the start time by the monotonic clock."""
+        elapsed_us = (time.monotonic_ns() - self._t0_mono) // 1000
+        return (self._t0_wall + timedelta(microseconds=elapsed_us)).isoformat()
+
+    def _record_event(self, section: str, entry: Dict[str, Any]) -> None:
+        """Keep an entry in memory and append it to the JSON Lines event file.
+
+        Appending keeps per-event I/O proportional to the entry itself; the aggregated
+        JSON document is only rewritten on the first event and in finalise_operation."""
+        line = json.dumps({"section": section, **entry}, default=str) + "\n"
+        with self._lock:
+            if not self._org_id and entry.get("organization_id"):
+                self._org_id = entry["organization_id"]
+            self.log_data[section].append(entry)
+            self._write_events(line)
+
+    def _record_events(self, section: str, entries: List[Dict[str, Any]]) -> None:
+        """Batch form of _record_event: one lock acquisition and one write for all entries."""
+        if not entries:
+            return
+        lines = "".join(json.dumps({"section": section, **entry}, default=str) + "\n" for entry in entries)
+        with self._lock:
+            if not self._org_id and entries[0].get("organization_id"):
+                self._org_id = entries[0]["organization_id"]
+            self.log_data[section].extend(entries)
+            self._write_events(lines)
+
+    def _write_events(self, text: str) -> None:
+        """Append complete JSON Lines to the event file (caller holds the lock).
+
+        On the first event the file is opened and the aggregated JSON is written, so a
+        run that stops before finalise_operation is still found as the latest run. The
+        file is line buffered: every event (or batch) is on disk once this returns."""
+        if self._events_fp is None:
+            first_event = not self.events_file.exists()
+            self._events_fp = open(self.events_file, 'a', buffering=1, encoding='utf-8')
+            if first_event:
+                self._save_log()
+        self._events_fp.write(text)
 
     def _save_log(self) -> None:
         """Save current log data to JSON file."""
         try:
-            with open(self.log_file, 'w') as f:
-                json.dump(self.log_data, f, indent=2, default=str)
+            # json.dumps builds the document in one pass; json.dump would issue a
+            # write() per encoded fragment, which dominates on large logs
+            self.log_file.write_text(json.dumps(self.log_data, indent=2, default=str))
         except Exception as e:
-            self.logger.error(f"Failed to save log file: {e}")
+            self.logger.error("Failed to save log file: %s", e)
 
 
 def test_logging():
@@ -325,9 +487,14 @@ def test_logging():
     # Test permission logging
     logger.log_permission_mapped("Business Unit", "test-id-123", "Users", "group-123", "Read", "org-123")
     logger.log_permission_failed("Business Unit", "Failed Group", "Edit", "org-123", "Test error")
+    logger.log_permissions_batch("Users", "group-123", "org-123",
+                                 [("Business Unit/A1", "test-id-456", "Edit")])
+    logger.log_permissions_failed_batch("Failed Group", "org-123",
+                                        [("Business Unit/A1", "Read")], "Test error")
 
     # Finalise
-    logger.finalise_operation("Test Operation", 6, 4, "test.csv")
+    logger.finalise_operation("Test Operation", 8, 5, "test.csv")
+    logger.close()
 
     print(" Test logging completed")
 
@@ -6,51 +6,86 @@ Handles OAuth2 client credentials authentication for the Bitwarden Public API.
 """
 
 import os
+import json
+import hashlib
 import time
+import random
+import threading
 import requests
 import datetime
+import atexit
 import logging
-from dotenv import load_dotenv
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from requests.adapters import HTTPAdapter
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 from typing import Optional, Tuple
 
-# Load environment variables from .env file
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
+from config import REPO_ROOT, ensure_dir, get_config
+
+# Per-user cache for bearer tokens, so consecutive runs skip the identity round-trip
+_TOKEN_CACHE_DIR = Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'bw_mapping_tool'
 
 
 class BitwardenAPIAuth:
     """Handle Bitwarden Public API authentication using OAuth2 client credentials."""
 
     def __init__(self, log_dir: str = "../logs"):
-        self.server_url = os.getenv('BW_SERVER_URL', "https://vault.bitwarden.com/")
-        self.api_url = os.getenv('BW_API_URL', "https://api.bitwarden.com")
-        self.identity_url = os.getenv('BW_IDENTITY_URL', "https://identity.bitwarden.com/connect/token")
+        cfg = get_config()
+        self.server_url = cfg.server_url
+        self.api_url = cfg.api_url
+        self.identity_url = cfg.identity_url
         self.groups_url = f"{self.api_url}/public/groups"
         self.collections_url = f"{self.api_url}/public/collections"
 
-        self.organization_id = os.getenv('BW_ORGID')
-        self.client_id = os.getenv('BW_ORGCLIENTID')
-        self.client_secret = os.getenv('BW_ORGCLIENTSECRET')
+        self.organization_id = cfg.organization_id
+        self.client_id = cfg.org_client_id
+        self.client_secret = cfg.org_client_secret
 
         self.bearer_token: Optional[str] = None
         self.bearer_timeout: Optional[datetime.datetime] = None
+        # Monotonic deadline (expiry minus the 60s buffer) checked by is_token_valid:
+        # one float compare, and immune to wall-clock jumps
+        self._expiry_monotonic: float = 0.0
+        # Request headers for the current token; rebuilt only when the token changes
+        self._headers: Optional[dict] = None
+        # On-disk copy of the bearer token, shared by every step and run; set once the
+        # credentials are validated (the file name is derived from them)
+        self.token_cache_path: Optional[Path] = None
 
         # Preventative throttle: timestamp (monotonic seconds) of the last request.
         # Used to space requests out under the API's 5 req/s limit.
         self._last_request_monotonic: float = 0.0
+        # Requests may be issued from worker threads (see BitwardenGroupsManager), so
+        # pacing and token refresh are serialised behind locks.
+        self._throttle_lock = threading.Lock()
+        self._token_lock = threading.Lock()
+
+        # Long-lived session so API calls reuse keep-alive TCP/TLS connections instead
+        # of handshaking per request. Pool sized for the concurrent group/permission workers.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
 
         self._setup_logging(log_dir)
         self._validate_credentials()
 
+        # Keyed by a hash of the credentials: never stores them, and a rotated secret
+        # simply misses the cache
+        cache_key = hashlib.sha256(f"{self.client_id}|{self.client_secret}".encode()).hexdigest()
+        self.token_cache_path = _TOKEN_CACHE_DIR / f"token_{cache_key}.json"
+
     def _setup_logging(self, log_dir: str):
         """Set up dedicated logging for API authentication."""
         # Convert relative path to absolute from script location
         if not Path(log_dir).is_absolute():
-            log_path = Path(__file__).parent.parent / log_dir.lstrip("../")
+            log_path = REPO_ROOT / log_dir.lstrip("../")
         else:
             log_path = Path(log_dir)
-        log_path.mkdir(exist_ok=True)
+        ensure_dir(log_path)
 
         # Create timestamped log file for API authentication
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -71,14 +106,26 @@ class BitwardenAPIAuth:
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
 
+        # The file gets a DEBUG record per request; hand those to a background listener
+        # so request threads only enqueue. Console stays synchronous so INFO lines keep
+        # their order relative to the scripts' print() output.
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._log_file_handler = file_handler
+        self._log_queue_handler = QueueHandler(log_queue)
+        self._log_listener: Optional[QueueListener] = QueueListener(log_queue, file_handler)
+        self._log_listener.start()
+        atexit.register(self._stop_log_listener)
+
         # Set up logger
         self.logger = logging.getLogger(f"BitwardenAPIAuth_{timestamp}")
         self.logger.setLevel(logging.DEBUG)
 
         # Clear existing handlers to avoid duplicates
         self.logger.handlers.clear()
+        # Don't also echo through the root logger (bw_auth configures it via basicConfig)
+        self.logger.propagate = False
 
-        self.logger.addHandler(file_handler)
+        self.logger.addHandler(self._log_queue_handler)
         self.logger.addHandler(console_handler)
 
         self.logger.info(" Bitwarden API Authentication logging initialised")
@@ -86,9 +133,13 @@ class BitwardenAPIAuth:
 
     def _validate_credentials(self):
         """Validate that all required credentials are present."""
-        required_vars = ['BW_ORGID', 'BW_ORGCLIENTID', 'BW_ORGCLIENTSECRET']
+        required_vars = {
+            'BW_ORGID': self.organization_id,
+            'BW_ORGCLIENTID': self.client_id,
+            'BW_ORGCLIENTSECRET': self.client_secret
+        }
 
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
+        missing_vars = [var for var, value in required_vars.items() if not value]
         if missing_vars:
             self.logger.error(f" Missing required environment variables: {', '.join(missing_vars)}")
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -116,7 +167,8 @@ class BitwardenAPIAuth:
         try:
             self.logger.info(" Requesting bearer token from Bitwarden API...")
             self.logger.debug(f" Token URL: {self.identity_url}")
-            response = requests.post(self.identity_url, headers=headers, data=auth_data)
+            # Same pooled session as the API calls, so a refresh mid-run reuses its connection
+            response = self.session.post(self.identity_url, headers=headers, data=auth_data)
             response.raise_for_status()
 
             token_data = response.json()
@@ -126,6 +178,9 @@ class BitwardenAPIAuth:
 
             self.bearer_token = bearer_token
             self.bearer_timeout = bearer_timeout
+            self._expiry_monotonic = time.monotonic() + token_expiry - 60
+            self._headers = self._build_headers(bearer_token)
+            self._save_cached_token()
 
             self.logger.info(f" Bearer token obtained successfully")
             self.logger.info(f" Token expires at: {bearer_timeout}")
@@ -141,59 +196,158 @@ class BitwardenAPIAuth:
             self.logger.error(f" Unexpected token response format: {e}")
             raise
 
-    def is_token_valid(self) -> bool:
-        """Check if current token is still valid."""
-        if not self.bearer_token or not self.bearer_timeout:
+    def _load_cached_token(self) -> bool:
+        """
+        Adopt the token cached on disk by an earlier step or run, if it is still valid.
+
+        Returns:
+            True if a usable cached token was loaded
+        """
+        if not self.token_cache_path or not self.token_cache_path.exists():
             return False
 
-        # Add 60 second buffer before expiry
-        return datetime.datetime.now() < (self.bearer_timeout - datetime.timedelta(seconds=60))
+        try:
+            with open(self.token_cache_path, 'r') as f:
+                cached = json.load(f)
+            remaining = cached["expires_at"] - time.time()
+            if remaining <= 60:
+                return False
+
+            self.bearer_token = cached["token"]
+            self.bearer_timeout = datetime.datetime.fromtimestamp(cached["expires_at"])
+            self._expiry_monotonic = time.monotonic() + remaining - 60
+            self._headers = self._build_headers(self.bearer_token)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.debug(f" Ignoring unreadable token cache: {e}")
+            return False
+
+        self.logger.info(f" Reusing cached bearer token (expires at: {self.bearer_timeout})")
+        return True
+
+    def _save_cached_token(self) -> None:
+        """Write the current token to the cache file, readable by the owner only."""
+        if not self.token_cache_path:
+            return
+
+        cached = {
+            "token": self.bearer_token,
+            "expires_at": self.bearer_timeout.timestamp()
+        }
+        tmp_path = self.token_cache_path.with_name(f"{self.token_cache_path.name}.{os.getpid()}.tmp")
+        try:
+            ensure_dir(self.token_cache_path.parent)
+            # The token grants org-level API access: create the file 0600 from the start,
+            # then swap it in atomically so a concurrent run never reads a partial file
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cached, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.token_cache_path)
+        except OSError as e:
+            tmp_path.unlink(missing_ok=True)
+            self.logger.warning(f" Could not write token cache: {e}")
+
+    def is_token_valid(self) -> bool:
+        """Check if current token is still valid, falling back to the on-disk cache."""
+        # _expiry_monotonic already includes the 60 second buffer before expiry
+        if self.bearer_token is not None and time.monotonic() < self._expiry_monotonic:
+            return True
+
+        return self._load_cached_token()
 
     def get_valid_token(self) -> str:
         """Get a valid bearer token, refreshing if necessary."""
-        if not self.is_token_valid():
-            self.logger.info(" Token expired or missing, obtaining new token...")
-            self.get_auth_bearer_token()
-        else:
-            self.logger.debug(" Using existing valid token")
+        with self._token_lock:
+            if not self.is_token_valid():
+                self.logger.info(" Token expired or missing, obtaining new token...")
+                self.get_auth_bearer_token()
+            else:
+                self.logger.debug(" Using existing valid token")
 
-        return self.bearer_token
+            return self.bearer_token
 
-    def get_auth_headers(self) -> dict:
-        """Get authorization headers for API requests."""
-        token = self.get_valid_token()
+    @staticmethod
+    def _build_headers(token: str) -> dict:
+        """Build the request headers for a bearer token."""
         return {
             "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Accept": "application/json"
         }
 
+    def invalidate_token(self, stale_headers: Optional[dict] = None) -> None:
+        """
+        Drop the current token, its prebuilt headers and the on-disk copy.
+
+        Args:
+            stale_headers: Headers the rejected request was sent with. If another thread
+                has already replaced them with a fresh token, nothing is dropped.
+        """
+        with self._token_lock:
+            if stale_headers is not None and self._headers is not stale_headers:
+                return
+            self.bearer_token = None
+            self.bearer_timeout = None
+            self._expiry_monotonic = 0.0
+            self._headers = None
+            if self.token_cache_path:
+                try:
+                    self.token_cache_path.unlink(missing_ok=True)
+                except OSError as e:
+                    self.logger.warning(f" Could not remove token cache: {e}")
+
+    def get_auth_headers(self) -> dict:
+        """Get authorization headers for API requests (prebuilt when the token was set)."""
+        self.get_valid_token()
+        return self._headers
+
     # Backoff schedule (seconds) for transient server errors. Length defines max retries.
     _RETRY_BACKOFFS_SECONDS = (1, 4, 10)
     # Rate-limit backoff: API responds with "Try again in 1m." — a flat 60s matches
     # what the server asks for. Used when a 429 sneaks through despite the throttle.
     _RATE_LIMIT_BACKOFF_SECONDS = 60
+    # Random extra wait added to every backoff, so concurrent workers that failed
+    # together don't all retry in the same instant.
+    _RETRY_JITTER_SECONDS = 1.0
     # Preventative pacing: Bitwarden's public API allows 5 req/s. 0.25s between
     # requests = 4 req/s, well under the limit with a small safety margin.
     _MIN_REQUEST_INTERVAL_SECONDS = 0.25
 
     @staticmethod
     def _parse_retry_after(response: "requests.Response", default: int) -> int:
-        """Return the Retry-After header value in seconds, or `default` if missing/non-numeric."""
+        """Return the Retry-After header value in seconds, or `default` if missing/unparseable."""
         header = response.headers.get("Retry-After")
         if header:
             try:
                 return max(1, int(header))
             except ValueError:
-                pass  # HTTP-date form not supported here — fall back to default
+                pass
+            # HTTP-date form: wait until that moment
+            try:
+                retry_at = parsedate_to_datetime(header)
+                if retry_at.tzinfo is None:
+                    retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)  # "-0000" dates are UTC
+                now = datetime.datetime.now(datetime.timezone.utc)
+                return max(1, int((retry_at - now).total_seconds()))
+            except (TypeError, ValueError):
+                pass
         return default
 
+    def _with_jitter(self, delay: float) -> float:
+        """Add a random 0..jitter seconds to a backoff delay."""
+        return delay + random.uniform(0, self._RETRY_JITTER_SECONDS)
+
     def _throttle(self) -> None:
-        """Sleep just long enough that the next request stays under the rate limit."""
-        elapsed = time.monotonic() - self._last_request_monotonic
-        wait = self._MIN_REQUEST_INTERVAL_SECONDS - elapsed
-        if wait > 0:
-            time.sleep(wait)
-        self._last_request_monotonic = time.monotonic()
+        """Sleep just long enough that the next request stays under the rate limit.
+
+        Holding the lock while sleeping queues concurrent callers, so request start
+        times stay spaced out even when several threads share this instance."""
+        with self._throttle_lock:
+            elapsed = time.monotonic() - self._last_request_monotonic
+            wait = self._MIN_REQUEST_INTERVAL_SECONDS - elapsed
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request_monotonic = time.monotonic()
 
     def make_api_request(self, method: str, endpoint: str, data: dict = None) -> requests.Response:
         """
@@ -202,8 +356,8 @@ class BitwardenAPIAuth:
         Pacing: every request is preceded by `_throttle()`, which spaces calls out
         to stay under the API's 5 req/s ceiling. Retry: HTTP 5xx and network errors
         use the short backoff schedule; HTTP 429 (rate limit) uses a flat 60s wait
-        (or Retry-After if the server provides one). 4xx other than 429 are not
-        retried — those are deterministic client problems.
+        (or Retry-After if the server provides one); HTTP 401 refreshes the token and
+        retries once. Other 4xx are not retried — those are deterministic client problems.
 
         Args:
             method: HTTP method (GET, POST, PUT, DELETE)
@@ -219,6 +373,7 @@ class BitwardenAPIAuth:
             raise ValueError(f"Unsupported HTTP method: {method}")
 
         max_attempts = len(self._RETRY_BACKOFFS_SECONDS) + 1
+        reauthenticated = False
 
         for attempt in range(max_attempts):
             # Refresh token each attempt — covers the edge case of expiry mid-retry.
@@ -229,21 +384,22 @@ class BitwardenAPIAuth:
                 else f"API Request (retry {attempt}/{len(self._RETRY_BACKOFFS_SECONDS)})"
             )
             self.logger.info(f" {attempt_label}: {method_upper} {url}")
-            if data and attempt == 0:
-                self.logger.debug(f"Request data: {data}")
+            # Payloads can be large; skip rendering them unless DEBUG is enabled
+            if data and attempt == 0 and self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Request data: %s", data)
 
             self._throttle()
 
             try:
-                response = requests.request(
+                response = self.session.request(
                     method_upper, url, headers=headers,
                     json=data if data is not None else None,
                 )
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                 if attempt < max_attempts - 1:
-                    delay = self._RETRY_BACKOFFS_SECONDS[attempt]
+                    delay = self._with_jitter(self._RETRY_BACKOFFS_SECONDS[attempt])
                     self.logger.warning(
-                        f" Network error on attempt {attempt + 1}: {e}; retrying in {delay}s"
+                        f" Network error on attempt {attempt + 1}: {e}; retrying in {delay:.1f}s"
                     )
                     time.sleep(delay)
                     continue
@@ -253,23 +409,32 @@ class BitwardenAPIAuth:
                 )
                 raise
 
+            # Unauthorised (401): the token was revoked or expired early. Drop it and
+            # retry once with a fresh one; a second 401 is a real credentials problem.
+            if response.status_code == 401 and not reauthenticated and attempt < max_attempts - 1:
+                self.logger.warning(" Bearer token rejected (401); obtaining a new token and retrying")
+                self.invalidate_token(headers)
+                reauthenticated = True
+                continue
+
             # Rate limit (429): pace ourselves out then retry. Should rarely trigger
             # now that we throttle preemptively, but we keep this as a safety net.
             if response.status_code == 429 and attempt < max_attempts - 1:
-                delay = self._parse_retry_after(response, default=self._RATE_LIMIT_BACKOFF_SECONDS)
+                delay = self._with_jitter(
+                    self._parse_retry_after(response, default=self._RATE_LIMIT_BACKOFF_SECONDS))
                 self.logger.warning(
                     f" Rate limited (429) on attempt {attempt + 1}: "
-                    f"{response.text[:300]}; retrying in {delay}s"
+                    f"{response.text[:300]}; retrying in {delay:.1f}s"
                 )
                 time.sleep(delay)
                 continue
 
             # Retry on server-side errors (5xx). Other 4xx falls through to raise_for_status.
             if 500 <= response.status_code < 600 and attempt < max_attempts - 1:
-                delay = self._RETRY_BACKOFFS_SECONDS[attempt]
+                delay = self._with_jitter(self._RETRY_BACKOFFS_SECONDS[attempt])
                 self.logger.warning(
                     f" Server error {response.status_code} on attempt {attempt + 1}: "
-                    f"{response.text[:300]}; retrying in {delay}s"
+                    f"{response.text[:300]}; retrying in {delay:.1f}s"
                 )
                 time.sleep(delay)
                 continue
@@ -297,6 +462,21 @@ class BitwardenAPIAuth:
         # Loop exited without returning or raising — guard against silent bugs.
         raise RuntimeError("make_api_request retry loop exited unexpectedly")
 
+    def _stop_log_listener(self) -> None:
+        """Drain the queued file log records, stop the listener and close the file."""
+        if self._log_listener is None:
+            return
+        atexit.unregister(self._stop_log_listener)
+        self.logger.removeHandler(self._log_queue_handler)
+        self._log_listener.stop()
+        self._log_file_handler.close()
+        self._log_listener = None
+
+    def close(self) -> None:
+        """Release the pooled HTTP connections and the file log. Safe to call more than once."""
+        self.session.close()
+        self._stop_log_listener()
+
 
 def test_auth():
     """
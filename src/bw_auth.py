@@ -6,14 +6,20 @@ Handles authentication and session management for the Bitwarden CLI tool.
 """
 
 import os
+import re
+import json
+import time
+import random
+import threading
+import atexit
+import socket
 import subprocess
 import logging
-from dotenv import load_dotenv
-from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, List, Optional, Tuple
 
-# Load environment variables from .env file
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
+from config import get_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,33 +28,79 @@ logger = logging.getLogger(__name__)
 class BitwardenAuth:
     """Handle Bitwarden CLI authentication and session management."""
 
+    # Port for the local `bw serve` bridge when BW_SERVE_PORT is unset or blank
+    _DEFAULT_SERVE_PORT = 8087
+
+    # Bridge calls go on to the Bitwarden server, so they get the same retry treatment
+    # as BitwardenAPIAuth.make_api_request: short backoff for 5xx/network errors, a
+    # longer wait for rate limiting, plus jitter so concurrent creates don't retry in step.
+    _RETRY_BACKOFFS_SECONDS = (1, 4, 10)
+    _RATE_LIMIT_BACKOFF_SECONDS = 60
+    _RETRY_JITTER_SECONDS = 1.0
+    # Minimum spacing between bridge request starts, shared by all worker threads
+    _MIN_REQUEST_INTERVAL_SECONDS = 0.1
+    # bw serve relays server errors as {"success": false, "message": ...}, often with a
+    # generic status code; rate limiting is recognised from the message as well
+    _RATE_LIMIT_MESSAGE_RE = re.compile(r"too many requests|rate limit|try again in", re.IGNORECASE)
+
     def __init__(self):
         self.bw_cmd = "bw"
         self.session_key = None
-        self.server_url = os.getenv('BW_SERVER_URL', "https://vault.bitwarden.com/")
-        self.organization_id = os.getenv('BW_ORGID')
-        self.username = os.getenv('BW_USERNAME')
-        self.master_password = os.getenv('BW_MASTERPASSWORD')
-        self.client_id = os.getenv('BW_USERCLIENTID')
-        self.client_secret = os.getenv('BW_USERCLIENTSECRET')
+        cfg = get_config()
+        self.server_url = cfg.server_url
+        self.organization_id = cfg.organization_id
+        self.username = cfg.username
+        self.master_password = cfg.master_password
+        self.client_id = cfg.user_client_id
+        self.client_secret = cfg.user_client_secret
+
+        # Local `bw serve` REST bridge, started on demand by start_serve()
+        self.serve_port = self._parse_serve_port(cfg.serve_port)
+        self.serve_url = f"http://localhost:{self.serve_port}"
+        self.serve_process: Optional[subprocess.Popen] = None
+        # Keep-alive session for the bridge: concurrent collection creates reuse a small
+        # pool of localhost connections instead of opening one per request
+        self.serve_session = requests.Session()
+        self.serve_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
+        self._serve_throttle_lock = threading.Lock()
+        self._last_serve_request_monotonic: float = 0.0
 
         self._validate_credentials()
 
+        # Environment for `bw login --apikey`, built once rather than copied per login
+        self._login_env = {**os.environ, "BW_CLIENTID": self.client_id, "BW_CLIENTSECRET": self.client_secret}
+
+    @classmethod
+    def _parse_serve_port(cls, value: Optional[str]) -> int:
+        """Parse BW_SERVE_PORT, treating a missing or blank value as the default."""
+        if value is None or not value.strip():
+            return cls._DEFAULT_SERVE_PORT
+        try:
+            port = int(value)
+        except ValueError:
+            port = 0
+        if not 1 <= port <= 65535:
+            raise ValueError(f"BW_SERVE_PORT must be a port number between 1 and 65535, got {value!r}")
+        return port
+
     def _validate_credentials(self):
         """Validate that all required credentials are present."""
-        required_vars = [
-            'BW_ORGID', 'BW_USERNAME', 'BW_MASTERPASSWORD',
-            'BW_USERCLIENTID', 'BW_USERCLIENTSECRET'
-        ]
+        required_vars = {
+            'BW_ORGID': self.organization_id,
+            'BW_USERNAME': self.username,
+            'BW_MASTERPASSWORD': self.master_password,
+            'BW_USERCLIENTID': self.client_id,
+            'BW_USERCLIENTSECRET': self.client_secret
+        }
 
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
+        missing_vars = [var for var, value in required_vars.items() if not value]
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
     def logout(self):
         """Logout from Bitwarden CLI."""
         try:
-            result = subprocess.run([self.bw_cmd, "logout"],
+            result = subprocess.run((self.bw_cmd, "logout"),
                                   capture_output=True, text=True, check=False)
             logger.info("Logged out from Bitwarden CLI")
             return True
@@ -59,15 +111,10 @@ class BitwardenAuth:
     def login(self):
         """Authenticate with Bitwarden CLI using API key."""
         try:
-            # Set environment variables for the CLI
-            env = os.environ.copy()
-            env["BW_CLIENTID"] = self.client_id
-            env["BW_CLIENTSECRET"] = self.client_secret
-
-            # Login with API key
+            # Login with API key (credentials supplied via the prebuilt environment)
             result = subprocess.run(
-                [self.bw_cmd, "login", "--apikey"],
-                env=env,
+                (self.bw_cmd, "login", "--apikey"),
+                env=self._login_env,
                 capture_output=True,
                 text=True,
                 check=True
@@ -85,7 +132,7 @@ class BitwardenAuth:
         try:
             # Unlock vault and get session key
             result = subprocess.run(
-                [self.bw_cmd, "unlock", self.master_password, "--raw"],
+                (self.bw_cmd, "unlock", self.master_password, "--raw"),
                 capture_output=True,
                 text=True,
                 check=True
@@ -105,7 +152,10 @@ class BitwardenAuth:
         """Complete authentication flow: logout, login, and unlock."""
         logger.info("Starting Bitwarden CLI authentication...")
 
-        # Step 1: Logout (reset any existing session)
+        # Step 1: Logout (reset any existing session). A bridge from an earlier flow is
+        # stopped first: it would keep serving the old session, and start_serve() below
+        # would otherwise reuse it.
+        self.stop_serve()
         self.logout()
 
         # Step 2: Login with API key
@@ -117,15 +167,41 @@ class BitwardenAuth:
         if not session_key:
             raise Exception("Vault unlock failed")
 
+        # Step 4: Start the REST bridge so later commands skip a Node.js start-up each
+        self.start_serve()
+
         logger.info("Bitwarden CLI authentication complete")
         return session_key
 
+    def _serve_route(self, command_args) -> Optional[Tuple[str, str, Optional[dict]]]:
+        """Map a CLI command with a `bw serve` equivalent to (method, path, params)."""
+        # Callers may pass a list or a tuple; compare one normalised form
+        args = tuple(command_args)
+        if args == ("sync",):
+            return "POST", "/sync", None
+        if len(args) == 4 and args[:3] == ("list", "org-collections", "--organizationid"):
+            return "GET", "/list/object/org-collections", {"organizationId": args[3]}
+        return None
+
     def run_command(self, command_args, use_session=True, input_data=None):
         """Run a Bitwarden CLI command. Session key supplied via BW_SESSION
-        env_var (set in unlock())"""
+        env_var (set in unlock())
+
+        Commands with a REST equivalent go through the running `bw serve` bridge and
+        return the same JSON/text the CLI would print; anything else spawns `bw`."""
+        route = self._serve_route(command_args) if input_data is None else None
+        if route and self._serve_running():
+            method, path, params = route
+            data = self.serve_request(method, path, params=params)
+            if isinstance(data, dict) and data.get("object") == "list":
+                return json.dumps(data.get("data", []))
+            if isinstance(data, dict) and data.get("object") == "message":
+                return data.get("title") or ""
+            return json.dumps(data)
+
         try:
             result = subprocess.run(
-                [self.bw_cmd] + command_args,
+                (self.bw_cmd, *command_args),
                 input=input_data,
                 capture_output=True,
                 text=True,
@@ -137,6 +213,166 @@ class BitwardenAuth:
             logger.error(f"Error: {e.stderr}")
             raise
 
+    def list_org_collections(self) -> List[dict]:
+        """List the organisation's collections as parsed objects.
+
+        With the bridge running the decoded `data` list is returned directly, with no
+        JSON text round-trip; otherwise the CLI output is parsed."""
+        command_args = ["list", "org-collections", "--organizationid", self.organization_id]
+        if self._serve_running():
+            method, path, params = self._serve_route(command_args)
+            return self.serve_request(method, path, params=params).get("data", [])
+        return json.loads(self.run_command(command_args))
+
+    def start_serve(self, timeout: float = 30.0) -> str:
+        """Start `bw serve` on localhost (once) and wait until it answers requests.
+
+        One long-lived `bw` process replaces a Node.js start-up per CLI call. The
+        session key is inherited from BW_SESSION, so call this after unlock()."""
+        if self._serve_running():
+            return self.serve_url
+
+        # Something already listening (e.g. a `bw serve` left by a killed run) would answer
+        # the readiness poll and receive our requests against whatever vault it has open
+        if self._port_in_use(self.serve_port):
+            raise Exception(
+                f"Port {self.serve_port} is already in use on localhost; stop the process "
+                f"listening there (possibly a leftover `bw serve`) or set BW_SERVE_PORT"
+            )
+
+        logger.info(f"Starting bw serve on port {self.serve_port}...")
+        self.serve_process = subprocess.Popen(
+            (self.bw_cmd, "serve", "--hostname", "localhost", "--port", str(self.serve_port)),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        atexit.register(self.stop_serve)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.serve_process.poll() is not None:
+                raise Exception(f"bw serve exited with code {self.serve_process.returncode}")
+            try:
+                self.serve_session.get(f"{self.serve_url}/status", timeout=1)
+            except requests.exceptions.RequestException:
+                time.sleep(0.25)
+                continue
+            # The answer must come from our process, not one that grabbed the port first
+            if self.serve_process.poll() is not None:
+                raise Exception(f"bw serve exited with code {self.serve_process.returncode}")
+            logger.info("bw serve is ready")
+            return self.serve_url
+
+        self.stop_serve()
+        raise Exception(f"bw serve did not become ready within {timeout:.0f}s")
+
+    @staticmethod
+    def _port_in_use(port: int) -> bool:
+        """True if something accepts connections on localhost:port (IPv4 or IPv6)."""
+        try:
+            with socket.create_connection(("localhost", port), timeout=0.5):
+                return True
+        except OSError:
+            return False
+
+    def _serve_running(self) -> bool:
+        """True if the `bw serve` bridge has been started and is still alive."""
+        return self.serve_process is not None and self.serve_process.poll() is None
+
+    def stop_serve(self):
+        """Stop the `bw serve` process if it is running."""
+        if self.serve_process is None:
+            return
+        atexit.unregister(self.stop_serve)
+        if self.serve_process.poll() is None:
+            self.serve_process.terminate()
+            try:
+                self.serve_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.serve_process.kill()
+            logger.info("Stopped bw serve")
+        self.serve_process = None
+
+    def serve_request(self, method: str, path: str, params: Optional[dict] = None,
+                      json_body: Optional[dict] = None) -> Any:
+        """Send a request to the `bw serve` REST API and return its `data` payload.
+
+        Starts the bridge on first use; if a started bridge has died, fails instead of
+        silently spawning a replacement mid-run. Requests are paced across threads, and
+        rate limiting (429 or a rate-limit message), 5xx and network errors are retried
+        with jittered backoff; other failures are raised immediately."""
+        if self.serve_process is None:
+            self.start_serve()
+        elif self.serve_process.poll() is not None:
+            raise Exception(f"bw serve exited unexpectedly with code {self.serve_process.returncode}")
+
+        max_attempts = len(self._RETRY_BACKOFFS_SECONDS) + 1
+        for attempt in range(max_attempts):
+            last_attempt = attempt == max_attempts - 1
+            self._throttle_serve()
+
+            try:
+                response = self.serve_session.request(method, f"{self.serve_url}{path}",
+                                                      params=params, json=json_body)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if self.serve_process.poll() is not None:
+                    raise Exception(f"bw serve exited unexpectedly with code {self.serve_process.returncode}") from e
+                if last_attempt:
+                    logger.error(f"bw serve request failed after {attempt + 1} attempts: {method} {path} - {e}")
+                    raise
+                delay = self._with_jitter(self._RETRY_BACKOFFS_SECONDS[attempt])
+                logger.warning(f"bw serve network error on attempt {attempt + 1}: {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {}
+
+            if response.ok and payload.get("success"):
+                return payload.get("data")
+
+            message = payload.get("message") or response.text
+            rate_limited = response.status_code == 429 or bool(self._RATE_LIMIT_MESSAGE_RE.search(message or ""))
+            if not last_attempt and (rate_limited or response.status_code >= 500):
+                if rate_limited:
+                    delay = self._with_jitter(self._parse_retry_after(response))
+                    reason = "rate limited"
+                else:
+                    delay = self._with_jitter(self._RETRY_BACKOFFS_SECONDS[attempt])
+                    reason = f"server error {response.status_code}"
+                logger.warning(f"bw serve {reason} on attempt {attempt + 1}: {message[:300]}; "
+                               f"retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            logger.error(f"bw serve request failed: {method} {path}")
+            logger.error(f"Error: {message}")
+            raise Exception(f"bw serve {method} {path} failed ({response.status_code}): {message}")
+
+        # Loop exited without returning or raising — guard against silent bugs.
+        raise RuntimeError("serve_request retry loop exited unexpectedly")
+
+    def _throttle_serve(self) -> None:
+        """Space bridge request starts out, queueing concurrent callers behind a lock."""
+        with self._serve_throttle_lock:
+            wait = self._MIN_REQUEST_INTERVAL_SECONDS - (time.monotonic() - self._last_serve_request_monotonic)
+            if wait > 0:
+                time.sleep(wait)
+            self._last_serve_request_monotonic = time.monotonic()
+
+    def _parse_retry_after(self, response: requests.Response) -> int:
+        """Retry-After in seconds if the bridge passed one through, else the flat rate-limit wait."""
+        try:
+            return max(1, int(response.headers.get("Retry-After", "")))
+        except ValueError:
+            return self._RATE_LIMIT_BACKOFF_SECONDS
+
+    def _with_jitter(self, delay: float) -> float:
+        """Add a random 0..jitter seconds to a backoff delay."""
+        return delay + random.uniform(0, self._RETRY_JITTER_SECONDS)
+
 
 def test_cli_auth():
     """
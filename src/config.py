@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Configuration Module
+
+Loads the .env file once per process and snapshots the Bitwarden settings
+shared by the CLI and Public API modules. Also holds the repository root that
+relative log/output paths are resolved against.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Repository root; .env and relative log/output paths are resolved against it
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Directories already created by ensure_dir() in this process
+_MKDIR_CACHE: set[Path] = set()
+
+
+def ensure_dir(path: Path) -> None:
+    """Create a directory (and any missing parents) once per process."""
+    if path not in _MKDIR_CACHE:
+        path.mkdir(parents=True, exist_ok=True)
+        _MKDIR_CACHE.add(path)
+
+
+@dataclass(slots=True, frozen=True)
+class Config:
+    """Bitwarden settings read from the environment (and .env)."""
+    server_url: str
+    api_url: str
+    identity_url: str
+    organization_id: Optional[str]
+    # Personal API key + master password, used by the Bitwarden CLI
+    username: Optional[str]
+    master_password: Optional[str]
+    user_client_id: Optional[str]
+    user_client_secret: Optional[str]
+    # Organisation API key, used by the Public API
+    org_client_id: Optional[str]
+    org_client_secret: Optional[str]
+    # Raw BW_SERVE_PORT value; parsed by BitwardenAuth, the only user of the bridge
+    serve_port: Optional[str]
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Load .env (first call only) and return the settings snapshot."""
+    load_dotenv(REPO_ROOT / '.env')
+
+    return Config(
+        server_url=os.getenv('BW_SERVER_URL', "https://vault.bitwarden.com/"),
+        api_url=os.getenv('BW_API_URL', "https://api.bitwarden.com"),
+        identity_url=os.getenv('BW_IDENTITY_URL', "https://identity.bitwarden.com/connect/token"),
+        organization_id=os.getenv('BW_ORGID'),
+        username=os.getenv('BW_USERNAME'),
+        master_password=os.getenv('BW_MASTERPASSWORD'),
+        user_client_id=os.getenv('BW_USERCLIENTID'),
+        user_client_secret=os.getenv('BW_USERCLIENTSECRET'),
+        org_client_id=os.getenv('BW_ORGCLIENTID'),
+        org_client_secret=os.getenv('BW_ORGCLIENTSECRET'),
+        serve_port=os.getenv('BW_SERVE_PORT')
+    )
@@ -1,4 +1,5 @@
 import csv
+import sys
 from typing import List, Dict, Set
 from pathlib import Path
 
@@ -8,27 +9,54 @@ class CollectionPermissionParser:
 
     def __init__(self, csv_path: str):
         self.csv_path = Path(csv_path)
-        self.collections = []
         self.groups = []
+        # collection_path -> {group: level}; insertion order doubles as the CSV row order
         self.permissions = {}
+        # Every path prefix, and parent -> children, built while parsing
+        self._unique: Set[str] = set()
+        self._hierarchy: Dict[str, List[str]] = {}
+
+    @property
+    def collections(self) -> List[str]:
+        """Collection paths in CSV order (derived from the permissions dict)."""
+        return list(self.permissions)
+
+    def read_groups(self) -> List[str]:
+        """Read only the header row and return the group names (every column but 'Path')."""
+        with open(self.csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+            header = next(csv.reader(csvfile), [])
+
+        self.groups = [col for col in header if col != 'Path']
+        return self.groups
 
     def parse(self) -> Dict:
         """Parse the CSV file and extract collections, groups, and permissions."""
         with open(self.csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+            # Plain csv.reader: no per-row dict, and group columns are picked by index
+            reader = csv.reader(csvfile)
+            header = next(reader, [])
+            path_idx = header.index('Path')
 
             # Extract group names from headers (skip 'Path' column)
-            self.groups = [col for col in reader.fieldnames if col != 'Path']
+            group_idxs = [i for i, col in enumerate(header) if col != 'Path']
+            self.groups = [sys.intern(header[i]) for i in group_idxs]
+            width = len(header)
 
             # Parse each row
             for row in reader:
-                collection_path = row['Path']
-                self.collections.append(collection_path)
+                if not row:
+                    continue  # blank line (DictReader skipped these too)
+                if len(row) < width:
+                    row += [''] * (width - len(row))
 
-                # Store permissions for this collection; treat blank/whitespace cells as "None"
+                collection_path = row[path_idx]
+                self._index_path(collection_path)
+
+                # Store permissions for this collection; treat blank/whitespace cells as "None".
+                # Interned, so the handful of distinct levels share one string each.
                 self.permissions[collection_path] = {
-                    group: (row[group].strip() if row[group] and row[group].strip() else "None")
-                    for group in self.groups
+                    group: sys.intern(row[i].strip() or "None")
+                    for group, i in zip(self.groups, group_idxs)
                 }
 
         return {
@@ -37,33 +65,26 @@ class CollectionPermissionParser:
             'permissions': self.permissions
         }
 
+    def _index_path(self, path: str) -> None:
+        """Add each prefix of a path to the unique set and hierarchy, once per prefix."""
+        parent = 'root'
+        start = 0
+        while True:
+            # Slice at each '/' rather than re-splitting and re-joining the segments
+            sep = path.find('/', start)
+            prefix = path if sep < 0 else path[:sep]
+            if prefix not in self._unique:
+                self._unique.add(prefix)
+                self._hierarchy.setdefault(parent, []).append(prefix)
+            if sep < 0:
+                return
+            parent = prefix
+            start = sep + 1
+
     def get_unique_collections(self) -> Set[str]:
-        """Extract unique collection names from paths."""
-        collections = set()
-        for path in self.collections:
-            # Add each segment of the path as a collection
-            parts = path.split('/')
-            for i in range(len(parts)):
-                collection_path = '/'.join(parts[:i+1])
-                collections.add(collection_path)
-        return collections
+        """Extract unique collection names from paths (precomputed by parse())."""
+        return self._unique
 
     def get_collection_hierarchy(self) -> Dict[str, List[str]]:
-        """Build collection hierarchy mapping parent -> children."""
-        hierarchy = {}
-        unique_collections = self.get_unique_collections()
-
-        for collection in unique_collections:
-            parts = collection.split('/')
-            if len(parts) > 1:
-                parent = '/'.join(parts[:-1])
-                if parent not in hierarchy:
-                    hierarchy[parent] = []
-                hierarchy[parent].append(collection)
-            else:
-                # Root level collection
-                if 'root' not in hierarchy:
-                    hierarchy['root'] = []
-                hierarchy['root'].append(collection)
-
-        return hierarchy
\ No newline at end of file
+        """Build collection hierarchy mapping parent -> children (precomputed by parse())."""
+        return self._hierarchy
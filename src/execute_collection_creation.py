@@ -9,7 +9,6 @@ from csv_parser import CollectionPermissionParser
 from bitwarden_collections import BitwardenCollectionManager
 from bw_auth import BitwardenAuth
 from bulk_logger import BulkLogger
-import json
 
 
 def main():
@@ -19,6 +18,8 @@ def main():
     print(" Org Collection Creation")
     print("=" * 50)
 
+    auth = None
+    logger = None
     try:
         # Step 1: Initialise logging
         print("\n1. Initialising logging...")
@@ -39,8 +40,9 @@ def main():
         unique_collections = parser.get_unique_collections()
 
         print(f"   ✓ Found {len(unique_collections)} unique collections to create")
-        for collection in sorted(unique_collections):
-            print(f"     - {collection}")
+        if unique_collections:
+            # One write for the whole listing rather than one print() per collection
+            print("\n".join(f"     - {collection}" for collection in sorted(unique_collections)))
 
         # Step 4: Initialise collection manager with logger
         print("\n4. Initialising collection manager...")
@@ -55,36 +57,30 @@ def main():
         print("\n6. Creating collections in Bitwarden...")
         print("-" * 40)
 
-        # Sort to ensure parent collections are created first
-        sorted_collections = sorted(unique_collections, key=lambda x: (x.count('/'), x))
-
-        created_count = 0
         existing_count = 0
-        failed_count = 0
-
-        for collection_path in sorted_collections:
-            collection_name = collection_path.split('/')[-1]
+        to_create = []
+        skipped_lines = []
 
+        # Sort to ensure parent collections are created first (depth decorated once, no key lambda)
+        for _, collection_path in sorted((path.count('/'), path) for path in unique_collections):
             if collection_path in existing_collections:
                 existing_id = existing_collections[collection_path]
-                print(f"Skipping (already exists): '{collection_path}' → ID: {existing_id}")
+                skipped_lines.append(f"Skipping (already exists): '{collection_path}' → ID: {existing_id}")
                 logger.log_collection_existing(
                     collection_path=collection_path,
                     collection_id=existing_id,
                     organization_id=auth.organization_id
                 )
                 existing_count += 1
-                continue
+            else:
+                to_create.append(collection_path)
+        if skipped_lines:
+            print("\n".join(skipped_lines))
 
-            try:
-                print(f"Creating: '{collection_path}' (leaf name: {collection_name})")
-                collection_info = collection_manager.create_collection(collection_name, collection_path)
-                print(f"    Success! Full path stored as name. ID: {collection_info.id}")
-                created_count += 1
-
-            except Exception as e:
-                print(f"    Failed: {e}")
-                failed_count += 1
+        # Create the remaining collections one depth level at a time, siblings concurrently
+        created = collection_manager.create_collections_from_paths(to_create)
+        created_count = sum(1 for path in to_create if path in created)
+        failed_count = len(to_create) - created_count
 
         # Step 7: Finalise logging
         print(f"\n7. Finalising operation logs...")
@@ -104,15 +100,13 @@ def main():
         # Step 8: List collections in org for verification
         print(f"\n8. Listing current collections for verification...")
         try:
-            collections_result = auth.run_command([
-                "list", "org-collections",
-                "--organizationid", auth.organization_id
-            ])
-            collections_data = json.loads(collections_result)
+            collections_data = auth.list_org_collections()
 
             print(f"   Current collections in organisation:")
-            for collection in collections_data:
-                print(f"     - {collection['name']} (ID: {collection['id']})")
+            if collections_data:
+                print("\n".join(
+                    f"     - {collection['name']} (ID: {collection['id']})" for collection in collections_data
+                ))
 
         except Exception as e:
             print(f"     Could not list collections: {e}")
@@ -121,6 +115,13 @@ def main():
         print(f"\n ERROR: {e}")
         return False
 
+    finally:
+        # Don't leave an unlocked `bw serve` running for the rest of the workflow
+        if auth is not None:
+            auth.stop_serve()
+        if logger is not None:
+            logger.close()
+
     return True
 
 